@@ -1,11 +1,5 @@
-import os
-import sys
+__all__ = ("api_router", "metrics_router", "templates_router", "AuthMiddleware", "CompressionMiddleware", "MetricsMiddleware")
 
-sys.path.append(os.path.abspath(".."))
 
-
-__all__ = ("api_router", "templates_router", "AuthMiddleware")
-
-
-from .middleware import AuthMiddleware
-from .routes import api_router, templates_router
+from .middleware import AuthMiddleware, CompressionMiddleware, MetricsMiddleware
+from .routes import api_router, metrics_router, templates_router
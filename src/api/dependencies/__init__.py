@@ -1,12 +1,7 @@
-import os
-import sys
-
-sys.path.append(os.path.abspath("../.."))
-
-
-__all__ = ("Database", "database", "Auth", "auth", "Templates", "templates")
+__all__ = ("Database", "database", "Auth", "auth", "Templates", "templates", "Static", "static")
 
 
 from .auth import Auth, auth
 from .database import Database, database
+from .static import Static, static
 from .templates import Templates, templates
@@ -4,6 +4,7 @@ import jwt
 
 import config
 from models.user import User
+from utils import Lazy, timed
 
 
 class Auth():
@@ -29,14 +30,15 @@ class Auth():
 		if token is None or not token:
 			token = await self.OAUTH2_SCHEME(request)
 
-		try:
-			payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
-		except jwt.ExpiredSignatureError:
-			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-		except jwt.InvalidTokenError:
-			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+		with timed("auth"):
+			try:
+				payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
+			except jwt.ExpiredSignatureError:
+				raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+			except jwt.InvalidTokenError:
+				raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-		user = await User.get(payload["sub"], fetch_links=True)
+			user = await User.get_cached(payload["sub"])
 
 		if user is None:
 			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="User not found")
@@ -44,6 +46,15 @@ class Auth():
 		return user
 
 	async def __call__(self, request: fastapi.Request) -> User:
+		lazy_user = request.scope.get("user")
+
+		# reuse the user already resolved for this request by AuthMiddleware
+		if isinstance(lazy_user, Lazy):
+			user = await lazy_user
+
+			if user is not None:
+				return user
+
 		return await self.get_current_user_with_exception(request)
 
 
@@ -1,11 +1,56 @@
 from pymongo import AsyncMongoClient
 
 import config
+from utils import Counter, Gauge, Histogram, MongoCommandListener, MongoPoolListener, SlowQueryLog
+from utils.metrics import REGISTRY
+
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+	"mongodb_command_duration_seconds",
+	"MongoDB command latency by collection and command",
+	("database", "collection", "command"),
+	buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter("mongodb_command_failures_total", "Failed MongoDB commands by collection and command", ("database", "collection", "command")))
+
+MONGO_POOL_CONNECTIONS = REGISTRY.register(Gauge("mongodb_pool_connections", "MongoDB pool connections by server that are open, in use or waiting to be checked out", ("server", "state")))
+MONGO_POOL_MAX_SIZE = REGISTRY.register(Gauge("mongodb_pool_max_size", "Configured maximum connections per MongoDB server"))
+MONGO_POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+	"mongodb_pool_checkout_wait_seconds",
+	"Time spent waiting for a pooled MongoDB connection",
+	("server",),
+	buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+))
+MONGO_POOL_CHECKOUT_FAILURES = REGISTRY.register(Counter("mongodb_pool_checkout_failures_total", "Failed MongoDB connection checkouts by server and reason", ("server", "reason")))
+
+SLOW_QUERY_LOG = SlowQueryLog(config.SLOW_QUERY_THRESHOLD, config.SLOW_QUERY_LOG_SIZE, config.SLOW_QUERY_EXPLAIN_INTERVAL)
 
 
 class Database():
 	def __init__(self, connection: str) -> None:
-		self._mongo = AsyncMongoClient(connection, tz_aware=True)
+		options = {
+			"maxPoolSize": config.MONGODB_MAX_POOL_SIZE,
+			"minPoolSize": config.MONGODB_MIN_POOL_SIZE,
+		}
+
+		if config.MONGODB_WAIT_QUEUE_TIMEOUT is not None:
+			options["waitQueueTimeoutMS"] = config.MONGODB_WAIT_QUEUE_TIMEOUT * 1000
+
+		if config.MONGODB_MAX_IDLE_TIME is not None:
+			options["maxIdleTimeMS"] = config.MONGODB_MAX_IDLE_TIME * 1000
+
+		if config.MONGODB_COMPRESSORS is not None:
+			options["compressors"] = config.MONGODB_COMPRESSORS
+
+		self._mongo = AsyncMongoClient(connection, tz_aware=True, event_listeners=[
+			MongoCommandListener(MONGO_COMMAND_DURATION, MONGO_COMMAND_FAILURES),
+			MongoPoolListener(MONGO_POOL_CONNECTIONS, MONGO_POOL_CHECKOUT_WAIT, MONGO_POOL_CHECKOUT_FAILURES),
+			SLOW_QUERY_LOG,
+		], **options)
+
+		MONGO_POOL_MAX_SIZE.set(config.MONGODB_MAX_POOL_SIZE)
+
+		# the log explains slow queries on the same client that ran them
+		SLOW_QUERY_LOG.client = self._mongo
 
 	def __call__(self) -> AsyncMongoClient:
 		return self._mongo
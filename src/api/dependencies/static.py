@@ -0,0 +1,12 @@
+from utils import FingerprintedStaticFiles
+
+
+class Static():
+	def __init__(self) -> None:
+		self._static = FingerprintedStaticFiles(directory="static")
+
+	def __call__(self) -> FingerprintedStaticFiles:
+		return self._static
+
+
+static = Static()
@@ -1,12 +1,69 @@
+import enum
+import urllib.parse
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any
+
+import fastapi
+import jinja2
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
+
+import config
+from models.catalog_cache import CATALOG_CACHE
+from models.read_routing import primary_reads
+from utils import MemoryCacheBackend, ReadThroughCache, conditional_response, timed
+
+from .static import static
 
 
 class Templates():
 	def __init__(self) -> None:
-		self._templates = Jinja2Templates(directory="templates")
+		self._templates: Jinja2Templates | None = None
+
+		self.fragments = ReadThroughCache(MemoryCacheBackend(maxsize=config.FRAGMENT_CACHE_SIZE), ttl=config.FRAGMENT_CACHE_TTL, load_context=primary_reads)
 
 	def __call__(self) -> Jinja2Templates:
+		# built on first use so importing the app, e.g. in every worker, stays cheap
+		if self._templates is None:
+			self._templates = Jinja2Templates(env=jinja2.Environment(
+				loader=jinja2.FileSystemLoader("templates"),
+				autoescape=jinja2.select_autoescape(),
+				bytecode_cache=jinja2.FileSystemBytecodeCache(config.TEMPLATE_BYTECODE_CACHE_DIR),
+			))
+
+			self._templates.env.globals["static_url"] = self.static_url
+
 		return self._templates
 
+	@staticmethod
+	@jinja2.pass_context
+	def static_url(context: dict[str, Any], path: str) -> str:
+		return str(context["request"].url_for("static", path=static().url_path(path)))
+
+	async def fragment(self, request: fastapi.Request, name: str, load_context: Callable[[], Awaitable[dict[str, Any]]], params: Mapping[str, Any] | None = None) -> Markup:
+		# fragments only depend on the parameters their loader uses and the catalog, any catalog write moves the version and orphans old entries
+		# so unused or reordered query parameters map to the same entry
+		query = urllib.parse.urlencode(sorted((key, value.value if isinstance(value, enum.Enum) else value) for key, value in (params or {}).items() if value is not None))
+		key = f"{name}:{CATALOG_CACHE.version}:{query}"
+
+		async def load() -> Markup:
+			context = await load_context()
+
+			with timed("render"):
+				return Markup(self().get_template(name).render({"request": request, **context}))
+
+		return await self.fragments.get_or_load(key, load)
+
+	async def render(self, request: fastapi.Request, name: str, context: dict[str, Any] | None = None) -> fastapi.Response:
+		user = await request.user
+
+		with timed("render"):
+			response = self().TemplateResponse(request=request, name=name, context={"user": user, **(context or {})})
+
+		if user is None:
+			return conditional_response(request, response, last_modified=CATALOG_CACHE.changed_at, shared=True)
+
+		return conditional_response(request, response)
+
 
 templates = Templates()
@@ -1,10 +1,6 @@
-import os
-import sys
-
-sys.path.append(os.path.abspath("../.."))
-
-
-__all__ = ("AuthMiddleware",)
+__all__ = ("AuthMiddleware", "CompressionMiddleware", "MetricsMiddleware")
 
 
 from .auth import AuthMiddleware
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware
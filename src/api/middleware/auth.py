@@ -1,21 +1,41 @@
-from collections.abc import Awaitable, Callable
-
 import fastapi
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from api.dependencies import auth
+from models import User, UserCartFetched
+from utils import Lazy
 
 
 class AuthMiddleware:
-	async def __call__(self, request: fastapi.Request, call_next: Callable[[fastapi.Request], Awaitable[fastapi.Response]]) -> fastapi.Response:
-		user = await auth.get_current_user(request)
+	BYPASS_PREFIXES: tuple[str, ...] = ("/static", "/docs", "/redoc", "/openapi.json", "/favicon.ico", "/metrics")
+
+	def __init__(self, app: ASGIApp, bypass_prefixes: tuple[str, ...] = BYPASS_PREFIXES) -> None:
+		self.app = app
+		self.bypass_prefixes = bypass_prefixes
 
-		request.scope["user"] = user
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
 
-		if user is not None:
-			request.scope["user_cart"] = await user.fetch_cart()
+		if scope["path"].startswith(self.bypass_prefixes):
+			scope["user"] = Lazy.ready(None)
+			scope["user_cart"] = Lazy.ready([])
 		else:
-			request.scope["user_cart"] = []
+			request = fastapi.Request(scope)
+
+			user = Lazy(lambda: auth.get_current_user(request))
+
+			scope["user"] = user
+			scope["user_cart"] = Lazy(lambda: self.fetch_cart(user))
+
+		await self.app(scope, receive, send)
+
+	@staticmethod
+	async def fetch_cart(user: Lazy[User | None]) -> list[UserCartFetched]:
+		resolved_user = await user
 
-		response = await call_next(request)
+		if resolved_user is None:
+			return []
 
-		return response
+		return await resolved_user.fetch_cart()
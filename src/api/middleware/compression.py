@@ -0,0 +1,105 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.compression import GZIP, ZSTD, Compressor, accepted_encodings
+
+EXCLUDED_CONTENT_TYPES: tuple[str, ...] = (
+	"application/gzip",
+	"application/zip",
+	"application/zstd",
+	"font/woff",
+	"font/woff2",
+	"image/",
+	"audio/",
+	"video/",
+	"text/event-stream",
+)
+
+
+class CompressionMiddleware:
+	def __init__(self, app: ASGIApp, minimum_size: int = 1024, levels: dict[str, int] | None = None) -> None:
+		self.app = app
+		self.minimum_size = minimum_size
+		self.levels = {GZIP: 6, ZSTD: 3, **(levels or {})}
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+
+		if not encodings:
+			await self.app(scope, receive, send)
+			return
+
+		encoding = encodings[0]
+
+		start: Message | None = None
+		compressor: Compressor | None = None
+		passthrough = False
+
+		async def send_compressed(message: Message) -> None:
+			nonlocal start, compressor, passthrough
+
+			if message["type"] == "http.response.start":
+				headers = Headers(raw=message["headers"])
+
+				passthrough = (
+					"content-encoding" in headers
+					or message["status"] in (204, 206, 304)
+					or headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+				)
+
+				if passthrough:
+					await send(message)
+				else:
+					# hold the start message until the first body chunk shows whether compressing pays off
+					start = message
+
+				return
+
+			if passthrough or message["type"] != "http.response.body":
+				if start is not None:
+					await send(start)
+					start = None
+
+				await send(message)
+				return
+
+			body = message.get("body", b"")
+			more_body = message.get("more_body", False)
+
+			if start is not None:
+				headers = MutableHeaders(raw=start["headers"])
+				headers.add_vary_header("Accept-Encoding")
+
+				if not more_body and len(body) < self.minimum_size:
+					passthrough = True
+				else:
+					compressor = Compressor(encoding, self.levels[encoding])
+
+					headers["Content-Encoding"] = encoding
+
+					if more_body:
+						del headers["Content-Length"]
+
+					if "etag" in headers and not headers["etag"].startswith("W/"):
+						# the representation changed, a strong validator would now be wrong
+						headers["ETag"] = f"W/{headers['etag']}"
+
+				if compressor is not None:
+					body = compressor.compress(body, final=not more_body)
+
+					if not more_body:
+						headers["Content-Length"] = str(len(body))
+
+				await send(start)
+				start = None
+
+				await send({**message, "body": body})
+				return
+
+			await send({**message, "body": compressor.compress(body, final=not more_body) if compressor is not None else body})
+
+		await self.app(scope, receive, send_compressed)
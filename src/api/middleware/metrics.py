@@ -0,0 +1,78 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils import Counter, Gauge, Histogram
+from utils.metrics import REGISTRY, REQUEST_TIMINGS, server_timing
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+HTTP_REQUESTS = REGISTRY.register(Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+HTTP_ERRORS = REGISTRY.register(Counter("http_request_errors_total", "HTTP requests that failed with a server error", ("method", "route")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",)))
+
+
+def route_label(scope: Scope) -> str:
+	route = scope.get("route")
+
+	if route is None:
+		# older starlette releases never set the route for a mount, so fall back to matching the mount prefixes
+		path = scope["path"]
+		route = next((mount for mount in getattr(scope.get("app"), "routes", ()) if isinstance(mount, Mount) and path.startswith(f"{mount.path}/")), None)
+
+	if route is None:
+		# unmatched paths would give every scanner probe its own series
+		return "unmatched"
+
+	if isinstance(route, Mount):
+		# mounted apps like /static serve arbitrary paths below their prefix
+		return f"{route.path}/{{path}}"
+
+	# the matched route's template, never the concrete path, so the label stays bounded
+	return route.path
+
+
+class MetricsMiddleware:
+	def __init__(self, app: ASGIApp) -> None:
+		self.app = app
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		method = scope["method"]
+
+		timings: dict[str, float] = {}
+		token = REQUEST_TIMINGS.set(timings)
+
+		started = time.perf_counter()
+		status = 500
+
+		HTTP_IN_FLIGHT.inc(method)
+
+		async def send_with_timing(message: Message) -> None:
+			nonlocal status
+
+			if message["type"] == "http.response.start":
+				status = message["status"]
+
+				MutableHeaders(scope=message).append("Server-Timing", server_timing({**timings, "app": time.perf_counter() - started}))
+
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_with_timing)
+		finally:
+			route = route_label(scope)
+
+			HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, route)
+			HTTP_REQUESTS.inc(method, route, str(status))
+
+			if status >= 500:
+				HTTP_ERRORS.inc(method, route)
+
+			HTTP_IN_FLIGHT.dec(method)
+
+			REQUEST_TIMINGS.reset(token)
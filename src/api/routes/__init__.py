@@ -1,15 +1,12 @@
-import os
-import sys
-
-sys.path.append(os.path.abspath("../.."))
-
-
-__all__ = ("api_router", "templates_router")
+__all__ = ("api_router", "metrics_router", "templates_router")
 
 
 from fastapi import APIRouter
 
 from .auth import router as auth_router
+from .catalog_import import router as catalog_import_router
+from .export import router as export_router
+from .metrics import router as metrics_router
 from .shop import router as shop_router
 from .templates import router as _templates_router
 
@@ -17,6 +14,8 @@ api_router = APIRouter()
 
 api_router.include_router(auth_router)
 api_router.include_router(shop_router)
+api_router.include_router(export_router)
+api_router.include_router(catalog_import_router)
 
 templates_router = APIRouter()
 
@@ -6,6 +6,8 @@ from pydantic import BaseModel, EmailStr
 
 from api.dependencies import auth
 from models import User
+from models.catalog_cache import CATALOG_CACHE
+from models.user import ASYNC_PASSWORD_HASHER, CART_CACHE, USER_CACHE
 
 router = fastapi.APIRouter(prefix="/auth")
 
@@ -46,7 +48,7 @@ async def register(response: fastapi.Response, register_request: RegisterRequest
 		email=register_request.email,
 		first_name=register_request.first_name,
 		last_name=register_request.last_name,
-		password_hash=User.hash_password(register_request.password),
+		password_hash=await User.hash_password_async(register_request.password),
 		phone_number=register_request.phone_number
 	)
 
@@ -62,7 +64,7 @@ async def register(response: fastapi.Response, register_request: RegisterRequest
 async def login(response: fastapi.Response, login_request: LoginRequest):
 	user = await User.find_one({"username": login_request.username})
 
-	if user is None or not user.verify_password(login_request.password):
+	if user is None or not await user.verify_password_async(login_request.password):
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
 	token = user.create_jwt_token()
@@ -75,7 +77,7 @@ async def login(response: fastapi.Response, login_request: LoginRequest):
 async def token(response: fastapi.Response, form_data: Annotated[OAuth2PasswordRequestForm, fastapi.Depends()]):
 	user = await User.find_one({"username": form_data.username})
 
-	if user is None or not user.verify_password(form_data.password):
+	if user is None or not await user.verify_password_async(form_data.password):
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
 	token = user.create_jwt_token()
@@ -90,10 +92,10 @@ async def whoami(user: Annotated[User, fastapi.Depends(auth)]):
 
 @router.post("/change_password", response_class=fastapi.responses.ORJSONResponse)
 async def change_password(user: Annotated[User, fastapi.Depends(auth)], change_password_request: ChangePasswordRequest):
-	if not user.verify_password(change_password_request.password):
+	if not await user.verify_password_async(change_password_request.password):
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-	user.password_hash = User.hash_password(change_password_request.new_password)
+	user.password_hash = await User.hash_password_async(change_password_request.new_password)
 
 	await user.save()
 
@@ -101,7 +103,7 @@ async def change_password(user: Annotated[User, fastapi.Depends(auth)], change_p
 
 @router.post("/change_phone_number", response_class=fastapi.responses.ORJSONResponse)
 async def change_phone_number(user: Annotated[User, fastapi.Depends(auth)], change_phone_number_request: ChangePhoneRequest):
-	if not user.verify_password(change_phone_number_request.password):
+	if not await user.verify_password_async(change_phone_number_request.password):
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
 	user.phone_number = change_phone_number_request.phone_number
@@ -124,3 +126,17 @@ async def change_name(user: Annotated[User, fastapi.Depends(auth)], change_name:
 	await user.save()
 
 	return {"status": "success", "data": "Name changed"}
+
+@router.get("/cache_stats", response_class=fastapi.responses.ORJSONResponse)
+async def cache_stats(user: Annotated[User, fastapi.Depends(auth)]):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	return {"status": "success", "data": {"users": USER_CACHE.stats(), "carts": CART_CACHE.stats(), "catalog": CATALOG_CACHE.stats()}}
+
+@router.get("/hasher_stats", response_class=fastapi.responses.ORJSONResponse)
+async def hasher_stats(user: Annotated[User, fastapi.Depends(auth)]):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	return {"status": "success", "data": ASYNC_PASSWORD_HASHER.stats()}
@@ -0,0 +1,34 @@
+import io
+from typing import Annotated
+
+import fastapi
+
+import config
+from api.dependencies import auth
+from models import CatalogImportKind, User, import_catalog
+from utils import ExportFormat, read_rows
+
+router = fastapi.APIRouter(prefix="/import")
+
+@router.post("/{kind}", response_class=fastapi.responses.ORJSONResponse)
+async def import_catalog_file(
+	user: Annotated[User, fastapi.Depends(auth)],
+	kind: Annotated[CatalogImportKind, fastapi.Path()],
+	file: Annotated[fastapi.UploadFile, fastapi.File()],
+	format: Annotated[ExportFormat, fastapi.Query()] = ExportFormat.NDJSON,
+	batch_size: Annotated[int, fastapi.Query(ge=1, le=50_000)] = config.IMPORT_BATCH_SIZE,
+):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	# the upload is spooled to disk by starlette, rows are read lazily one batch at a time
+	lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+
+	try:
+		report = await import_catalog(kind, read_rows(lines, format), batch_size, max_errors=config.IMPORT_MAX_ERRORS)
+	except UnicodeDecodeError:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail="File must be UTF-8 encoded")
+	finally:
+		lines.detach()
+
+	return {"status": "success", "data": report.as_dict()}
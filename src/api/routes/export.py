@@ -0,0 +1,95 @@
+import datetime
+from typing import Annotated, Any
+
+import fastapi
+from beanie import Document
+
+import config
+from api.dependencies import auth
+from models import Order, Product, ProductCategory, Review, User
+from utils import ExportFormat, stream_csv, stream_ndjson
+
+router = fastapi.APIRouter(prefix="/export")
+
+PRODUCT_COLUMNS = ("_id", "name", "description", "category", "brand", "gender", "sizes", "stock", "price", "image_url", "created_at", "rating")
+ORDER_COLUMNS = ("_id", "user", "items", "status", "total_price", "created_at")
+REVIEW_COLUMNS = ("_id", "user", "product", "rating", "comment", "created_at")
+
+
+def export_response(document_model: type[Document], filters: list[Any], columns: tuple[str, ...], export_format: ExportFormat) -> fastapi.responses.StreamingResponse:
+	# stream raw documents straight off the cursor, memory stays at one batch regardless of collection size
+	documents = document_model.get_pymongo_collection().find(document_model.find(*filters).get_filter_query(), batch_size=config.EXPORT_BATCH_SIZE)
+
+	if export_format is ExportFormat.CSV:
+		content = stream_csv(documents, columns, config.EXPORT_BATCH_SIZE)
+	else:
+		content = stream_ndjson(documents, config.EXPORT_BATCH_SIZE)
+
+	filename = f"{document_model.get_collection_name()}.{export_format.value}"
+
+	return fastapi.responses.StreamingResponse(content, media_type=export_format.media_type, headers={
+		"Content-Disposition": f"attachment; filename=\"{filename}\"",
+	})
+
+@router.get("/products")
+async def export_products(
+	user: Annotated[User, fastapi.Depends(auth)],
+	category_filter: Annotated[list[str], fastapi.Query(default_factory=list)],
+	min_price: Annotated[float | None, fastapi.Query()] = None,
+	max_price: Annotated[float | None, fastapi.Query()] = None,
+	since: Annotated[datetime.datetime | None, fastapi.Query()] = None,
+	format: Annotated[ExportFormat, fastapi.Query()] = ExportFormat.NDJSON,
+):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	if min_price is not None and max_price is not None and min_price > max_price:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail="Invalid price range")
+
+	filters = []
+
+	if category_filter:
+		filters.append(Product.in_categories(await ProductCategory.ids_by_name(category_filter)))
+
+	if min_price is not None:
+		filters.append(Product.price >= min_price)
+
+	if max_price is not None:
+		filters.append(Product.price <= max_price)
+
+	if since is not None:
+		filters.append(Product.created_at >= since)
+
+	return export_response(Product, filters, PRODUCT_COLUMNS, format)
+
+@router.get("/orders")
+async def export_orders(
+	user: Annotated[User, fastapi.Depends(auth)],
+	since: Annotated[datetime.datetime | None, fastapi.Query()] = None,
+	format: Annotated[ExportFormat, fastapi.Query()] = ExportFormat.NDJSON,
+):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	filters = []
+
+	if since is not None:
+		filters.append(Order.created_at >= since)
+
+	return export_response(Order, filters, ORDER_COLUMNS, format)
+
+@router.get("/reviews")
+async def export_reviews(
+	user: Annotated[User, fastapi.Depends(auth)],
+	since: Annotated[datetime.datetime | None, fastapi.Query()] = None,
+	format: Annotated[ExportFormat, fastapi.Query()] = ExportFormat.NDJSON,
+):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	filters = []
+
+	if since is not None:
+		filters.append(Review.created_at >= since)
+
+	return export_response(Review, filters, REVIEW_COLUMNS, format)
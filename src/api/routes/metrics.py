@@ -0,0 +1,9 @@
+import fastapi
+
+from utils.metrics import REGISTRY
+
+router = fastapi.APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+	return fastapi.responses.PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,16 +1,23 @@
+import asyncio
 from typing import Annotated
 
 import fastapi
 from annotated_types import Interval
 from beanie import PydanticObjectId
-from beanie.operators import In
 from pydantic import BaseModel, NonNegativeInt
 
 from api.dependencies import auth
-from models import Address, Order, Product, ProductCategory, Review, User, UserCart
+from api.dependencies.database import SLOW_QUERY_LOG
+from models import Address, CartChange, InsufficientStockError, Order, OrderStatus, Product, ProductCategory, ProductGender, ProductSort, Review, ShopStats, User
+from models.catalog_cache import BRANDS_KEY, CATALOG_CACHE, CATEGORIES_KEY, CATEGORY_TREE_KEY, product_key
+from models.read_routing import catalog_reads
 
 router = fastapi.APIRouter(prefix="/shop")
 
+ADMIN_PAGE_SIZE = 50
+
+CART_CHANGES_LIMIT = 100
+
 
 class PostReviewRequest(BaseModel):
 	rating: Annotated[int, Interval(ge=1, le=5)]
@@ -26,43 +33,101 @@ class AddAddressRequest(BaseModel):
 
 @router.get("/product_categories", response_class=fastapi.responses.ORJSONResponse)
 async def get_product_categories():
-	categories = await ProductCategory.find_many().to_list()
+	categories = await CATALOG_CACHE.get_or_load(CATEGORIES_KEY, lambda: ProductCategory.find_many().to_list())
 
 	return {"status": "success", "data": categories}
 
+@router.get("/category_tree", response_class=fastapi.responses.ORJSONResponse)
+async def get_category_tree():
+	# category writes and imports clear the catalog cache, so the tree is only rebuilt after a change
+	tree = await CATALOG_CACHE.get_or_load(CATEGORY_TREE_KEY, ProductCategory.tree)
+
+	return {"status": "success", "data": tree}
+
 @router.get("/product_brands", response_class=fastapi.responses.ORJSONResponse)
 async def get_product_brands():
-	categories = await Product.distinct("brands")
+	brands = await CATALOG_CACHE.get_or_load(BRANDS_KEY, lambda: Product.distinct("brand"))
 
-	return {"status": "success", "data": categories}
+	return {"status": "success", "data": brands}
 
 @router.get("/products", response_class=fastapi.responses.ORJSONResponse)
 async def get_products(
 	category_filter: Annotated[list[str], fastapi.Query(default_factory=list)],
 	min_price: Annotated[float | None, fastapi.Query()] = None,
-	max_price: Annotated[float | None, fastapi.Query()] = None
+	max_price: Annotated[float | None, fastapi.Query()] = None,
+	sort: Annotated[ProductSort, fastapi.Query()] = ProductSort.NEWEST,
+	limit: Annotated[int, fastapi.Query(ge=1, le=100)] = 24,
+	cursor: Annotated[str | None, fastapi.Query()] = None,
+	fields: Annotated[str | None, fastapi.Query()] = None,
 ):
 	if min_price is not None and max_price is not None and min_price > max_price:
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail="Invalid price range")
 
-	query = Product.find_many(fetch_links=True)
+	projection = None
+
+	if fields:
+		projection = frozenset(field.strip() for field in fields.split(",") if field.strip())
+
+		if not projection <= Product.PROJECTABLE_FIELDS:
+			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(projection - Product.PROJECTABLE_FIELDS))}")
+
+	with catalog_reads():
+		filters = []
+
+		if category_filter:
+			filters.append(Product.in_categories(await ProductCategory.ids_by_name(category_filter)))
+
+		if min_price is not None:
+			filters.append(Product.price >= min_price)
+
+		if max_price is not None:
+			filters.append(Product.price <= max_price)
+
+		try:
+			products, next_cursor = await Product.find_page(*filters, sort=sort, limit=limit, cursor=cursor, fields=projection)
+		except ValueError as e:
+			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+	# the views are already json native, so skip the encoder pass over every product
+	return fastapi.responses.ORJSONResponse({"status": "success", "data": products, "next_cursor": next_cursor})
+
+@router.get("/search", response_class=fastapi.responses.ORJSONResponse)
+async def search_products(
+	category_filter: Annotated[list[str], fastapi.Query(default_factory=list)],
+	q: Annotated[str | None, fastapi.Query(max_length=200)] = None,
+	gender: Annotated[ProductGender | None, fastapi.Query()] = None,
+	min_price: Annotated[float | None, fastapi.Query()] = None,
+	max_price: Annotated[float | None, fastapi.Query()] = None,
+	limit: Annotated[int, fastapi.Query(ge=1, le=100)] = 24,
+):
+	if min_price is not None and max_price is not None and min_price > max_price:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail="Invalid price range")
+
+	filters = []
 
 	if category_filter:
-		query = query.find(In(Product.category.name, category_filter))  # pyright: ignore[reportAttributeAccessIssue]
+		filters.append(Product.in_categories(await ProductCategory.ids_by_name(category_filter)))
+
+	if gender is not None:
+		filters.append(Product.gender == gender)
 
 	if min_price is not None:
-		query = query.find(Product.price >= min_price)
+		filters.append(Product.price >= min_price)
 
 	if max_price is not None:
-		query = query.find(Product.price <= max_price)
+		filters.append(Product.price <= max_price)
 
-	products = await query.to_list()
+	if not q and not filters:
+		products, _ = await Product.find_page(sort=ProductSort.NEWEST, limit=limit, fields=Product.SEARCH_FIELDS)
+		facets = await Product.catalog_facets()
+	else:
+		products, facets = await Product.search(*filters, text=q, limit=limit)
 
-	return {"status": "success", "data": products}
+	return fastapi.responses.ORJSONResponse({"status": "success", "data": products, "facets": facets})
 
 @router.get("/product/{product_id}", response_class=fastapi.responses.ORJSONResponse)
 async def get_product(product_id: Annotated[str, fastapi.Path()]):
-	product = await Product.get(PydanticObjectId(product_id), fetch_links=True)
+	product = await CATALOG_CACHE.get_or_load(product_key(product_id), lambda: Product.get(PydanticObjectId(product_id), fetch_links=True))
 
 	if product is None:
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_404_NOT_FOUND, detail="Product not found")
@@ -87,101 +152,90 @@ async def add_review(user: Annotated[User, fastapi.Depends(auth)], product_id: A
 	if product is None:
 		raise fastapi.HTTPException(status_code=404, detail="Product not found")
 
-	product_review = Review(user=user, product=product, rating=review.rating, comment=review.comment)
-
-	await product_review.save()
+	await Review.post(user, product, review.rating, review.comment)
 
 	return {"status": "success", "message": "Review added"}
 
-@router.put("/cart/{product_id}", response_class=fastapi.responses.ORJSONResponse)
-async def add_to_cart(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[str, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()], quantity: Annotated[NonNegativeInt, fastapi.Query()] = 1):
-	product = await Product.get(product_id)
+@router.get("/product/{product_id}/reviews", response_class=fastapi.responses.ORJSONResponse)
+async def get_reviews(
+	product_id: Annotated[str, fastapi.Path()],
+	limit: Annotated[int, fastapi.Query(ge=1, le=100)] = 20,
+	cursor: Annotated[str | None, fastapi.Query()] = None,
+):
+	try:
+		reviews, next_cursor = await Review.find_page(PydanticObjectId(product_id), limit=limit, cursor=cursor)
+	except ValueError as e:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-	if product is None:
-		raise fastapi.HTTPException(status_code=404, detail="Product not found")
+	return {"status": "success", "data": reviews, "next_cursor": next_cursor}
 
-	update_result = await user.get_pymongo_collection().update_one({
-		"_id": user.id,
-		"cart.product_id": product.id,
-		"cart.size": size,
-	}, {
-		"$inc": {"cart.$.quantity": quantity}
-	})
+async def missing_products(product_ids: list[PydanticObjectId]) -> list[str]:
+	# products are usually in the catalog cache already, so validating a cart change rarely costs a round trip
+	products = await asyncio.gather(*(CATALOG_CACHE.get_or_load(product_key(product_id), lambda product_id=product_id: Product.get(product_id, fetch_links=True)) for product_id in product_ids))
 
-	if update_result.matched_count == 0:
-		await user.update({
-			"$push": {
-				"cart": UserCart(
-					product_id=product.id,
-					size=size,
-					quantity=quantity,
-				).model_dump()
-			},
-		})
+	return [str(product_id) for product_id, product in zip(product_ids, products) if product is None]
+
+@router.put("/cart/{product_id}", response_class=fastapi.responses.ORJSONResponse)
+async def add_to_cart(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[PydanticObjectId, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()], quantity: Annotated[NonNegativeInt, fastapi.Query()] = 1):
+	if await missing_products([product_id]):
+		raise fastapi.HTTPException(status_code=404, detail="Product not found")
+
+	await user.change_cart([CartChange(product_id=product_id, size=size, quantity=quantity, increment=True)])
 
 	return {"status": "success", "message": "Product added to cart"}
 
 @router.patch("/cart/{product_id}", response_class=fastapi.responses.ORJSONResponse)
-async def add_to_cart_patch(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[str, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()], quantity: Annotated[int, fastapi.Query()] = 1):
-	product = await Product.get(product_id)
-
-	if product is None:
+async def add_to_cart_patch(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[PydanticObjectId, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()], quantity: Annotated[int, fastapi.Query()] = 1):
+	if quantity > 0 and await missing_products([product_id]):
 		raise fastapi.HTTPException(status_code=404, detail="Product not found")
 
-	if quantity > 0:
-		update_result = await user.get_pymongo_collection().update_one({
-			"_id": user.id,
-			"cart.product_id": product.id,
-			"cart.size": size,
-		}, {
-			"$set": {"cart.$.quantity": quantity}
-		})
-
-		if update_result.matched_count == 0:
-			await user.update({
-				"$push": {
-					"cart": UserCart(
-						product_id=product.id,
-						size=size,
-						quantity=quantity,
-					).model_dump(),
-				},
-			})
-	else:
-		await user.update({
-			"$pull": {
-				"cart": {
-					"product_id": product.id,
-					"size": size,
-				},
-			},
-		})
+	# a quantity of zero or less removes the line
+	await user.change_cart([CartChange(product_id=product_id, size=size, quantity=quantity)])
 
 	return {"status": "success", "message": "Product quantity changed in cart"}
 
-@router.delete("/cart/{product_id}", response_class=fastapi.responses.ORJSONResponse)
-async def remove_from_cart(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[str, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()]):
-	product = await Product.get(product_id)
+@router.patch("/cart", response_class=fastapi.responses.ORJSONResponse)
+async def change_cart(user: Annotated[User, fastapi.Depends(auth)], changes: Annotated[list[CartChange], fastapi.Body(min_length=1, max_length=CART_CHANGES_LIMIT)]):
+	missing = await missing_products(list({change.product_id for change in changes if change.quantity > 0}))
 
-	if product is None:
-		raise fastapi.HTTPException(status_code=404, detail="Product not found")
+	if missing:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_404_NOT_FOUND, detail=f"Products not found: {', '.join(missing)}")
 
+	await user.change_cart(changes)
+
+	return {"status": "success", "message": "Cart updated"}
+
+@router.delete("/cart/{product_id}", response_class=fastapi.responses.ORJSONResponse)
+async def remove_from_cart(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[PydanticObjectId, fastapi.Path(embed=True)], size: Annotated[str, fastapi.Query()]):
 	update_result = await user.get_pymongo_collection().update_one({
 		"_id": user.id,
 	}, {
 		"$pull": {
 			"cart": {
-				"product_id": product.id,
+				"product_id": product_id,
 				"size": size,
 			},
 		},
 	})
 
+	user.invalidate_cache()
+
 	if update_result.modified_count == 0:
 		raise fastapi.HTTPException(status_code=404, detail="Product not found in cart")
 
 	return {"status": "success", "message": "Product removed from removed"}
 
+@router.post("/checkout", response_class=fastapi.responses.ORJSONResponse)
+async def checkout(user: Annotated[User, fastapi.Depends(auth)]):
+	try:
+		order = await Order.checkout(user)
+	except InsufficientStockError as e:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT, detail=str(e))
+	except ValueError as e:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+	return {"status": "success", "message": "Order placed", "data": {"order_id": str(order.id), "total_price": order.total_price}}
+
 @router.get("/addresses", response_class=fastapi.responses.ORJSONResponse)
 async def get_addresses(user: Annotated[User, fastapi.Depends(auth)]):
 	addresses = await Address.find_all().to_list()
@@ -207,36 +261,64 @@ async def remove_addresses(user: Annotated[User, fastapi.Depends(auth)], address
 
 	return {"status": "success", "message": "Address removed"}
 
-@router.delete("/admin_stats", response_class=fastapi.responses.ORJSONResponse)
-async def admin_stats(user: Annotated[User, fastapi.Depends(auth)]):
+@router.patch("/product/{product_id}/stock", response_class=fastapi.responses.ORJSONResponse)
+async def update_stock(user: Annotated[User, fastapi.Depends(auth)], product_id: Annotated[str, fastapi.Path()], delta: Annotated[int, fastapi.Query()]):
 	if user.role != "admin":
 		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-	order_stats = await Order.aggregate([
-		{"$group": {
-			"_id": None,
-			"total_orders": {"$sum": 1},
-			"total_revenue": {"$sum": "$total_price"},
-		}},
-	]).to_list()
+	if not await Product.adjust_stock(PydanticObjectId(product_id), delta):
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT, detail="Product not found or not enough stock")
 
-	total_orders = order_stats[0]["total_orders"] if order_stats else 0
-	total_revenue = order_stats[0]["total_revenue"] if order_stats else 0
+	return {"status": "success", "message": "Stock updated"}
 
-	product_stats = await Product.aggregate([
-		{"$group": {
-			"_id": None,
-			"total_stock": {"$sum": "$stock"},
-		}},
-	]).to_list()
+@router.patch("/order/{order_id}/status", response_class=fastapi.responses.ORJSONResponse)
+async def change_order_status(user: Annotated[User, fastapi.Depends(auth)], order_id: Annotated[str, fastapi.Path()], status: Annotated[OrderStatus, fastapi.Query()]):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-	total_stock = product_stats[0]["total_stock"] if product_stats else 0
+	order = await Order.get(PydanticObjectId(order_id))
 
-	products = await Product.find_many(fetch_links=True).to_list()
+	if order is None:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+	if not await order.change_status(status):
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_409_CONFLICT, detail="Order status not changed")
+
+	return {"status": "success", "message": "Order status changed"}
+
+@router.delete("/admin_stats", response_class=fastapi.responses.ORJSONResponse)
+async def admin_stats(user: Annotated[User, fastapi.Depends(auth)], cursor: Annotated[str | None, fastapi.Query()] = None):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	stats = await ShopStats.get_current()
+
+	try:
+		products, next_cursor = await Product.find_page(sort=ProductSort.NEWEST, limit=ADMIN_PAGE_SIZE, cursor=cursor)
+	except ValueError as e:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 	return {
-		"total_orders": total_orders,
-		"total_revenue": total_revenue,
-		"total_stock": total_stock,
-		"products": products
+		"total_orders": stats.total_orders,
+		"total_revenue": stats.total_revenue,
+		"total_stock": stats.total_stock,
+		"orders_by_status": stats.orders_by_status,
+		"products": products,
+		"next_cursor": next_cursor,
 	}
+
+@router.get("/slow_queries", response_class=fastapi.responses.ORJSONResponse)
+async def get_slow_queries(user: Annotated[User, fastapi.Depends(auth)], flagged_only: Annotated[bool, fastapi.Query()] = False):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	return {"status": "success", "data": SLOW_QUERY_LOG.recent(flagged_only), "threshold_ms": SLOW_QUERY_LOG.threshold * 1000}
+
+@router.delete("/slow_queries", response_class=fastapi.responses.ORJSONResponse)
+async def clear_slow_queries(user: Annotated[User, fastapi.Depends(auth)]):
+	if user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+	SLOW_QUERY_LOG.clear()
+
+	return {"status": "success", "message": "Slow query log cleared"}
@@ -1,26 +1,47 @@
+import urllib.parse
 from typing import Annotated
 
 import fastapi
 from beanie import PydanticObjectId
 
-from api.dependencies import templates as get_templates
-from models import Order, Product, ProductCategory
+from api.dependencies import templates
+from models import Product, ProductCategory, ProductRecommendations, ProductSort, Review, ShopStats
+from models.catalog_cache import CATALOG_CACHE, CATEGORIES_KEY, product_key, recommendations_key
 
-templates = get_templates()
+SHOP_PAGE_SIZE = 24
+SHOP_FIELDS = frozenset(("name", "price", "image_url"))
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_FIELDS = frozenset(("name", "category", "price", "stock", "image_url"))
+
+REVIEWS_PAGE_SIZE = 10
+
+RECOMMENDATIONS_SIZE = 4
+RECOMMENDATIONS_FIELDS = frozenset(("name", "category", "price", "image_url"))
+
+LATEST_DROPS_SIZE = 8
+LATEST_DROPS_FIELDS = frozenset(("name", "category", "price", "image_url"))
 
 router = fastapi.APIRouter()
 
 @router.get("/")
 async def index(request: fastapi.Request):
-	return templates.TemplateResponse(request=request, name="index.html", context={})
+	async def load_latest_drops():
+		products, _ = await Product.find_page(sort=ProductSort.NEWEST, limit=LATEST_DROPS_SIZE, fields=LATEST_DROPS_FIELDS)
+
+		return {"featured_products": products}
+
+	return await templates.render(request, "index.html", {
+		"latest_drops": await templates.fragment(request, "fragments/latest_drops.html", load_latest_drops),
+	})
 
 @router.get("/login")
 async def login(request: fastapi.Request):
-	return templates.TemplateResponse(request=request, name="login.html", context={})
+	return await templates.render(request, "login.html")
 
 @router.get("/register")
 async def register(request: fastapi.Request):
-	return templates.TemplateResponse(request=request, name="register.html", context={})
+	return await templates.render(request, "register.html")
 
 @router.get("/logout")
 async def logout(request: fastapi.Request):
@@ -34,79 +55,114 @@ async def shop(
 	request: fastapi.Request,
 	category: str | None = None,
 	min_price: float | None = None,
-	max_price: float | None = None
+	max_price: float | None = None,
+	sort: ProductSort = ProductSort.NEWEST,
+	cursor: str | None = None,
 ):
-	query = Product.find_many(fetch_links=True)
-
-	if category:
-		query = query.find(Product.category.name == category)  # pyright: ignore[reportAttributeAccessIssue]
+	async def load_shop():
+		filters = []
+
+		if category:
+			filters.append(Product.in_categories(await ProductCategory.ids_by_name([category])))
+
+		if min_price is not None:
+			filters.append(Product.price >= min_price)
+
+		if max_price is not None:
+			filters.append(Product.price <= max_price)
+
+		try:
+			products, next_cursor = await Product.find_page(*filters, sort=sort, limit=SHOP_PAGE_SIZE, cursor=cursor, fields=SHOP_FIELDS)
+		except ValueError as e:
+			raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+		categories = await CATALOG_CACHE.get_or_load(CATEGORIES_KEY, lambda: ProductCategory.find_many().to_list())
+
+		facets = await Product.catalog_facets()
+
+		return {
+			"products": products,
+			"next_cursor": next_cursor,
+			# built from the parsed parameters, the fragment is shared by every url that maps to them
+			"next_page_query": urllib.parse.urlencode({name: value for name, value in {
+				"category": category,
+				"min_price": min_price,
+				"max_price": max_price,
+				"sort": sort.value,
+				"cursor": next_cursor,
+			}.items() if value is not None}),
+			"categories": categories,
+			"category_counts": {category["id"]: category["count"] for category in facets["categories"]},
+			"current_category": category,
+			"current_sort": sort,
+			"min_price": min_price,
+			"max_price": max_price
+		}
+
+	return await templates.render(request, "shop.html", {
+		"shop_content": await templates.fragment(request, "fragments/shop.html", load_shop, {
+			"category": category,
+			"min_price": min_price,
+			"max_price": max_price,
+			"sort": sort,
+			"cursor": cursor,
+		}),
+	})
 
-	if min_price is not None:
-		query = query.find(Product.price >= min_price)
+@router.get("/admin")
+async def admin(request: fastapi.Request, cursor: str | None = None):
+	user = await request.user
 
-	if max_price is not None:
-		query = query.find(Product.price <= max_price)
+	if user is None or user.role != "admin":
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-	products = await query.to_list()
+	stats = await ShopStats.get_current()
 
-	categories = await ProductCategory.find_many().to_list()
+	try:
+		products, next_cursor = await Product.find_page(sort=ProductSort.NEWEST, limit=ADMIN_PAGE_SIZE, cursor=cursor, fields=ADMIN_FIELDS)
+	except ValueError as e:
+		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-	return templates.TemplateResponse(request=request, name="shop.html", context={
+	return await templates.render(request, "admin.html", {
+		"total_orders": stats.total_orders,
+		"total_revenue": stats.total_revenue,
+		"total_stock": stats.total_stock,
 		"products": products,
-		"categories": categories,
-		"current_category": category,
-		"min_price": min_price,
-		"max_price": max_price
-	})
-
-@router.get("/admin")
-async def admin(request: fastapi.Request):
-	if request.user is None or request.user.role != "admin":
-		raise fastapi.HTTPException(status_code=fastapi.status.HTTP_403_FORBIDDEN, detail="Forbidden")
-
-	order_stats = await Order.aggregate([
-		{"$group": {
-			"_id": None,
-			"total_orders": {"$sum": 1},
-			"total_revenue": {"$sum": "$total_price"},
-		}},
-	]).to_list()
-
-	total_orders = order_stats[0]["total_orders"] if order_stats else 0
-	total_revenue = order_stats[0]["total_revenue"] if order_stats else 0
-
-	product_stats = await Product.aggregate([
-		{"$group": {
-			"_id": None,
-			"total_stock": {"$sum": "$stock"},
-		}},
-	]).to_list()
-
-	total_stock = product_stats[0]["total_stock"] if product_stats else 0
-
-	products = await Product.find_many(fetch_links=True).to_list()
-
-	return templates.TemplateResponse(request=request, name="admin.html", context={
-		"total_orders": total_orders,
-		"total_revenue": total_revenue,
-		"total_stock": total_stock,
-		"products": products
+		"next_cursor": next_cursor,
 	})
 
 @router.get("/cart")
 async def cart(request: fastapi.Request):
-	if request.user is None:
+	if await request.user is None:
 		return fastapi.responses.RedirectResponse(url="/login")
 
-	return templates.TemplateResponse(request=request, name="cart.html", context={})
+	cart = await request.scope["user_cart"]
+
+	return await templates.render(request, "cart.html", {
+		"cart": cart,
+		"total_price": sum(item.product.price * item.quantity for item in cart),
+	})
 
 @router.get("/product/{product_id}")
 async def product(request: fastapi.Request, product_id: Annotated[str, fastapi.Path()]):
-	product = await Product.get(PydanticObjectId(product_id), fetch_links=True)
+	async def load_product():
+		product = await CATALOG_CACHE.get_or_load(product_key(product_id), lambda: Product.get(PydanticObjectId(product_id), fetch_links=True))
+
+		if product is None:
+			raise fastapi.HTTPException(status_code=404, detail="Product not found")
+
+		reviews, next_reviews_cursor = await Review.find_page(product.id, limit=REVIEWS_PAGE_SIZE)
+
+		recommendations = await CATALOG_CACHE.get_or_load(recommendations_key(product.id), lambda: ProductRecommendations.for_product(product.id, RECOMMENDATIONS_SIZE, RECOMMENDATIONS_FIELDS))
 
-	if product is None:
-		raise fastapi.HTTPException(status_code=404, detail="Product not found")
+		return {
+			"product": product,
+			"recommendations": recommendations,
+			"reviews": reviews,
+			"next_reviews_cursor": next_reviews_cursor,
+		}
 
-	return templates.TemplateResponse(request=request, name="product.html", context={
-		"product": product,
+	return await templates.render(request, "product.html", {
+		"product_id": product_id,
+		"product_content": await templates.fragment(request, "fragments/product.html", load_product, {"product_id": product_id}),
 	})
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+from typing import Any
+
+from beanie import init_beanie
+from beanie.operators import In
+from bson import Decimal128, DBRef, ObjectId
+from pymongo import AsyncMongoClient
+
+import config
+from models import Address, Order, Product, ProductCategory, ProductGender, Review, User
+
+CATEGORY_NAMES = ("Shirts", "T-Shirts", "Hoodies", "Jackets", "Jeans", "Shorts", "Dresses", "Skirts", "Sneakers", "Boots", "Hats", "Bags")
+
+
+async def seed(products: int, batch_size: int = 10_000) -> None:
+	await Product.get_pymongo_collection().delete_many({})
+	await ProductCategory.get_pymongo_collection().delete_many({})
+
+	categories = [ProductCategory(name=name) for name in CATEGORY_NAMES]
+
+	for category in categories:
+		await category.insert()
+
+	rng = random.Random(0)
+	genders = [gender.value for gender in ProductGender]
+
+	for start in range(0, products, batch_size):
+		picked = [rng.choice(categories).id for _ in range(start, min(start + batch_size, products))]
+
+		await Product.get_pymongo_collection().insert_many([{
+			"_id": ObjectId(),
+			"name": f"Product {i}",
+			"category": DBRef(ProductCategory.get_collection_name(), category_id),
+			"category_path": [category_id],
+			"brand": f"Brand {rng.randrange(50)}",
+			"gender": rng.choice(genders),
+			"sizes": ["S", "M", "L"],
+			"stock": rng.randrange(100),
+			"price": Decimal128(str(Decimal(rng.randrange(500, 50_000)) / 100)),
+		} for i, category_id in zip(range(start, min(start + batch_size, products)), picked)], ordered=False)
+
+def plan_stages(explain: Any) -> list[str]:
+	stages = []
+
+	if isinstance(explain, dict):
+		if "stage" in explain:
+			stages.append(explain["stage"])
+
+		for key, value in explain.items():
+			if key not in ("rejectedPlans", "executionStats"):
+				stages.extend(plan_stages(value))
+	elif isinstance(explain, list):
+		for value in explain:
+			stages.extend(plan_stages(value))
+
+	return stages
+
+async def measure(name: str, run: Callable[[], Awaitable[Any]], repeat: int) -> dict[str, Any]:
+	await run()
+
+	timings = []
+
+	for _ in range(repeat):
+		started = time.perf_counter()
+		await run()
+		timings.append((time.perf_counter() - started) * 1000)
+
+	timings.sort()
+
+	return {
+		"plan": name,
+		"p50_ms": round(statistics.median(timings), 2),
+		"p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+	}
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+	database = client[args.database]
+
+	await init_beanie(database=database, document_models=[User, Address, ProductCategory, Product, Order, Review])
+
+	if args.seed or await Product.get_pymongo_collection().estimated_document_count() != args.products:
+		print(f"seeding {args.products} products into {args.database}...")
+		await seed(args.products)
+
+	names = list(CATEGORY_NAMES[:args.categories])
+
+	def lookup_query():
+		return Product.find(In(Product.category.name, names), Product.price <= args.max_price, fetch_links=True).sort(("price", 1)).limit(args.limit)  # pyright: ignore[reportAttributeAccessIssue]
+
+	async def indexed_query():
+		return Product.find(Product.in_categories(await ProductCategory.ids_by_name(names)), Product.price <= args.max_price).sort(("price", 1)).limit(args.limit)
+
+	lookup_explain = await database.command("explain", {"aggregate": Product.get_collection_name(), "pipeline": lookup_query().build_aggregation_pipeline(), "cursor": {}})
+
+	query = await indexed_query()
+	indexed_explain = await Product.get_pymongo_collection().find(query.get_filter_query()).sort([("price", 1)]).limit(args.limit).explain()
+
+	async def run_lookup():
+		await lookup_query().to_list()
+
+	async def run_indexed():
+		await (await indexed_query()).to_list()
+
+	results = [
+		await measure("name via $lookup", run_lookup, args.repeat),
+		await measure("id via category map", run_indexed, args.repeat),
+	]
+
+	results[0]["stages"] = plan_stages(lookup_explain)
+	results[1]["stages"] = plan_stages(indexed_explain)
+
+	for result in results:
+		print(f"{result['plan']:<24} p50={result['p50_ms']:>9}ms p95={result['p95_ms']:>9}ms stages={' > '.join(dict.fromkeys(result['stages']))}")
+
+	print(f"speedup: {results[0]['p50_ms'] / max(results[1]['p50_ms'], 0.001):.1f}x")
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Compare the $lookup category-name filter with the indexed category id filter")
+	parser.add_argument("--database", default=f"{config.MONGODB_DATABASE}_benchmark")
+	parser.add_argument("--products", type=int, default=100_000)
+	parser.add_argument("--categories", type=int, default=2)
+	parser.add_argument("--max-price", type=float, default=200)
+	parser.add_argument("--limit", type=int, default=24)
+	parser.add_argument("--repeat", type=int, default=20)
+	parser.add_argument("--seed", action="store_true", help="reseed even if the collection already has the requested size")
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
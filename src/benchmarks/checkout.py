@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import collections
+import time
+from decimal import Decimal
+
+from beanie import init_beanie
+from bson import DBRef, Decimal128, ObjectId
+from pymongo import AsyncMongoClient
+
+import config
+from models import Address, InsufficientStockError, Order, Product, ProductCategory, Review, ShopStats, User
+
+
+async def seed(buyers: int, stock: int, quantity: int) -> Product:
+	for document_model in (User, Product, ProductCategory, Order, ShopStats):
+		await document_model.get_pymongo_collection().delete_many({})
+
+	category = ProductCategory(name="Benchmark")
+	await category.insert()
+
+	product_id = ObjectId()
+
+	await Product.get_pymongo_collection().insert_one({
+		"_id": product_id,
+		"name": "Limited Sneaker",
+		"category": DBRef(ProductCategory.get_collection_name(), category.id),
+		"sizes": ["42"],
+		"stock": stock,
+		"price": Decimal128(Decimal("99.90")),
+	})
+
+	await User.get_pymongo_collection().insert_many([{
+		"username": f"buyer{i}",
+		"email": f"buyer{i}@example.com",
+		"first_name": f"Buyer {i}",
+		"role": "customer",
+		"password_hash": "-",
+		"cart": [{"product_id": product_id, "size": "42", "quantity": quantity}],
+	} for i in range(buyers)], ordered=False)
+
+	return await Product.get(product_id)
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True, maxPoolSize=max(args.concurrency, 10))
+	database = client[args.database]
+
+	await init_beanie(database=database, document_models=[User, Address, ProductCategory, Product, Order, Review, ShopStats])
+
+	print(f"seeding {args.buyers} buyers for one product with stock {args.stock} into {args.database}...")
+	product = await seed(args.buyers, args.stock, args.quantity)
+
+	users = await User.find_all().to_list()
+
+	semaphore = asyncio.Semaphore(args.concurrency)
+	outcomes: collections.Counter[str] = collections.Counter()
+	latencies = []
+
+	async def buy(user: User) -> None:
+		async with semaphore:
+			started = time.perf_counter()
+
+			try:
+				await Order.checkout(user)
+				outcomes["ordered"] += 1
+			except InsufficientStockError:
+				outcomes["sold_out"] += 1
+			except Exception as e:
+				outcomes[type(e).__name__] += 1
+
+			latencies.append((time.perf_counter() - started) * 1000)
+
+	started = time.perf_counter()
+	await asyncio.gather(*(buy(user) for user in users))
+	elapsed = time.perf_counter() - started
+
+	latencies.sort()
+
+	remaining_stock = (await Product.get(product.id)).stock
+	orders = await Order.get_pymongo_collection().count_documents({})
+	sold = args.stock - remaining_stock
+
+	print(f"buyers={args.buyers} concurrency={args.concurrency} elapsed={elapsed:.2f}s throughput={args.buyers / elapsed:.1f} checkouts/s")
+	print(f"p50={latencies[len(latencies) // 2]:.1f}ms p95={latencies[int(len(latencies) * 0.95) - 1]:.1f}ms outcomes={dict(outcomes)}")
+	print(f"stock {args.stock} -> {remaining_stock}, orders={orders}, units sold={sold}")
+
+	expected_orders = min(args.buyers, args.stock // args.quantity)
+
+	assert remaining_stock >= 0, "stock went negative"
+	assert sold == orders * args.quantity, "stock decrements do not match placed orders"
+	assert orders == outcomes["ordered"] == expected_orders, f"expected {expected_orders} orders"
+
+	print("no overselling")
+
+	await client.close()
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Many buyers checking out the same product at once, requires a replica set for transactions")
+	parser.add_argument("--database", default=f"{config.MONGODB_DATABASE}_benchmark")
+	parser.add_argument("--buyers", type=int, default=500)
+	parser.add_argument("--stock", type=int, default=100)
+	parser.add_argument("--quantity", type=int, default=1)
+	parser.add_argument("--concurrency", type=int, default=50)
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
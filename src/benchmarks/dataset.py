@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import datetime
+import random
+from decimal import Decimal
+
+from beanie import init_beanie
+from bson import Decimal128, DBRef, ObjectId
+from pymongo import AsyncMongoClient, UpdateOne
+
+import config
+from models import Address, Order, OrderStatus, Product, ProductCategory, ProductGender, Review, ShopStats, User
+from models.user import PASSWORD_HASHER
+
+CATEGORY_NAMES = ("Shirts", "T-Shirts", "Hoodies", "Jackets", "Jeans", "Shorts", "Dresses", "Skirts", "Sneakers", "Boots", "Hats", "Bags")
+SIZES = ("XS", "S", "M", "L", "XL")
+
+PASSWORD = "benchmark"
+ADMIN_USERNAME = "admin"
+
+DOCUMENT_MODELS = [User, Address, ProductCategory, Product, Order, Review, ShopStats]
+
+
+def user_name(index: int) -> str:
+	return f"user{index}"
+
+async def init_database(database_name: str) -> AsyncMongoClient:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+
+	await init_beanie(database=client[database_name], document_models=DOCUMENT_MODELS)
+
+	return client
+
+async def seed(products: int, users: int, reviews: int, orders: int, seed: int = 0, batch_size: int = 10_000) -> None:
+	# same seed, same documents and ids, so runs against the same size are comparable
+	rng = random.Random(seed)
+
+	def object_id() -> ObjectId:
+		return ObjectId(rng.randbytes(12))
+
+	for document_model in DOCUMENT_MODELS:
+		await document_model.get_pymongo_collection().delete_many({})
+
+	epoch = datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC)
+
+	category_ids = [object_id() for _ in CATEGORY_NAMES]
+
+	await ProductCategory.get_pymongo_collection().insert_many([
+		{"_id": category_id, "name": name, "parent": None, "ancestors": []} for category_id, name in zip(category_ids, CATEGORY_NAMES)
+	])
+
+	product_ids = [object_id() for _ in range(products)]
+	prices = {}
+
+	for start in range(0, products, batch_size):
+		documents = []
+
+		for index in range(start, min(start + batch_size, products)):
+			prices[product_ids[index]] = Decimal(rng.randrange(500, 50_000)) / 100
+			category_id = rng.choice(category_ids)
+
+			documents.append({
+				"_id": product_ids[index],
+				"name": f"Product {index}",
+				"description": f"Synthetic product {index} for benchmarks",
+				"category": DBRef(ProductCategory.get_collection_name(), category_id),
+				"category_path": [category_id],
+				"brand": f"Brand {rng.randrange(50)}",
+				"gender": rng.choice([gender.value for gender in ProductGender]),
+				"sizes": list(SIZES[:rng.randrange(2, len(SIZES) + 1)]),
+				"stock": rng.randrange(1_000, 10_000),
+				"price": Decimal128(str(prices[product_ids[index]])),
+				"image_url": f"https://example.com/products/{index}.jpg",
+				"created_at": epoch + datetime.timedelta(minutes=index),
+				"rating": {"count": 0, "total": 0, "histogram": {str(rating): 0 for rating in range(1, 6)}},
+			})
+
+		await Product.get_pymongo_collection().insert_many(documents, ordered=False)
+
+	# argon2 is deliberately slow, every synthetic user shares one hash
+	password_hash = PASSWORD_HASHER.hash(PASSWORD)
+
+	user_ids = [object_id() for _ in range(users + 1)]
+
+	for start in range(0, users + 1, batch_size):
+		await User.get_pymongo_collection().insert_many([{
+			"_id": user_ids[index],
+			"username": ADMIN_USERNAME if index == users else user_name(index),
+			"email": f"{ADMIN_USERNAME if index == users else user_name(index)}@example.com",
+			"first_name": f"User {index}",
+			"last_name": None,
+			"role": "admin" if index == users else "customer",
+			"password_hash": password_hash,
+			"phone_number": None,
+			"cart": [{
+				"product_id": product_id,
+				"size": "M",
+				"quantity": rng.randrange(1, 4),
+			} for product_id in rng.sample(product_ids, min(3, products))],
+			"created_at": epoch,
+		} for index in range(start, min(start + batch_size, users + 1))], ordered=False)
+
+	ratings: dict[ObjectId, list[int]] = {}
+
+	for start in range(0, reviews, batch_size):
+		documents = []
+
+		for index in range(start, min(start + batch_size, reviews)):
+			product_id = rng.choice(product_ids)
+			rating = rng.randrange(1, 6)
+
+			ratings.setdefault(product_id, []).append(rating)
+
+			documents.append({
+				"_id": object_id(),
+				"user": DBRef(User.get_collection_name(), rng.choice(user_ids)),
+				"product": DBRef(Product.get_collection_name(), product_id),
+				"rating": rating,
+				"comment": f"Synthetic review {index}",
+				"created_at": epoch + datetime.timedelta(seconds=index),
+			})
+
+		await Review.get_pymongo_collection().insert_many(documents, ordered=False)
+
+	rating_updates = [UpdateOne({"_id": product_id}, {"$set": {"rating": {
+		"count": len(product_ratings),
+		"total": sum(product_ratings),
+		"histogram": {str(rating): product_ratings.count(rating) for rating in range(1, 6)},
+	}}}) for product_id, product_ratings in ratings.items()]
+
+	for start in range(0, len(rating_updates), batch_size):
+		await Product.get_pymongo_collection().bulk_write(rating_updates[start:start + batch_size], ordered=False)
+
+	statuses = [status.value for status in OrderStatus]
+
+	for start in range(0, orders, batch_size):
+		documents = []
+
+		for _ in range(start, min(start + batch_size, orders)):
+			items = [{"product": DBRef(Product.get_collection_name(), product_id), "quantity": rng.randrange(1, 3), "size": "M"} for product_id in rng.sample(product_ids, min(2, products))]
+
+			documents.append({
+				"_id": object_id(),
+				"user": DBRef(User.get_collection_name(), rng.choice(user_ids)),
+				"items": items,
+				"status": rng.choice(statuses),
+				"total_price": Decimal128(str(sum(prices[item["product"].id] * item["quantity"] for item in items))),
+				"created_at": epoch,
+			})
+
+		await Order.get_pymongo_collection().insert_many(documents, ordered=False)
+
+	await ShopStats.reconcile()
+
+async def run(args: argparse.Namespace) -> None:
+	client = await init_database(args.database)
+
+	print(f"seeding {args.products} products, {args.users} users, {args.reviews} reviews and {args.orders} orders into {args.database}...")
+
+	await seed(args.products, args.users, args.reviews, args.orders, seed=args.seed)
+
+	await client.close()
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+	parser.add_argument("--database", default=f"{config.MONGODB_DATABASE}_benchmark")
+	parser.add_argument("--products", type=int, default=10_000)
+	parser.add_argument("--users", type=int, default=1_000)
+	parser.add_argument("--reviews", type=int, default=50_000)
+	parser.add_argument("--orders", type=int, default=5_000)
+	parser.add_argument("--seed", type=int, default=0)
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Seed a deterministic synthetic dataset for the benchmarks")
+	add_arguments(parser)
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import contextlib
+import pathlib
+import random
+import time
+from collections.abc import Awaitable, Callable
+
+import orjson
+
+import config
+from benchmarks.dataset import ADMIN_USERNAME, CATEGORY_NAMES, PASSWORD, user_name
+from benchmarks.report import print_results, read_results, summarize, write_results
+from benchmarks.transport import AsgiTransport, HttpTransport, Transport
+
+
+class Session():
+	def __init__(self, transport: Transport, users: int) -> None:
+		self.transport = transport
+		self.users = users
+
+		self.user_tokens: list[str] = []
+		self.admin_token = ""
+		self.product_ids: list[str] = []
+
+	async def login(self, username: str) -> str:
+		status, _, body = await self.transport.request("POST", "/api/v1/auth/login", {"content-type": "application/json"}, orjson.dumps({"username": username, "password": PASSWORD}))
+
+		if status != 200:
+			raise RuntimeError(f"login as {username} failed with {status}, seed the database with benchmarks.dataset first")
+
+		return orjson.loads(body)["data"]
+
+	async def prepare(self, logged_in_users: int) -> None:
+		self.user_tokens = [await self.login(user_name(index)) for index in range(min(logged_in_users, self.users))]
+		self.admin_token = await self.login(ADMIN_USERNAME)
+
+		_, _, body = await self.transport.request("GET", "/api/v1/shop/products?limit=100&fields=name")
+
+		self.product_ids = [product.get("id") or product.get("_id") for product in orjson.loads(body)["data"]]
+
+	def user_cookie(self, rng: random.Random) -> dict[str, str]:
+		return {"cookie": f"Authorization-Token={rng.choice(self.user_tokens)}"}
+
+	def admin_cookie(self) -> dict[str, str]:
+		return {"cookie": f"Authorization-Token={self.admin_token}"}
+
+
+type Flow = Callable[[Session, random.Random], Awaitable[int]]
+
+
+async def login_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("POST", "/api/v1/auth/login", {"content-type": "application/json"}, orjson.dumps({"username": user_name(rng.randrange(session.users)), "password": PASSWORD}))
+
+	return status
+
+async def products_api_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", f"/api/v1/shop/products?limit=24&category_filter={rng.choice(CATEGORY_NAMES)}&max_price={rng.randrange(50, 500)}")
+
+	return status
+
+async def shop_page_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", f"/shop?category={rng.choice(CATEGORY_NAMES)}")
+
+	return status
+
+async def product_api_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", f"/api/v1/shop/product/{rng.choice(session.product_ids)}")
+
+	return status
+
+async def product_page_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", f"/product/{rng.choice(session.product_ids)}", session.user_cookie(rng))
+
+	return status
+
+async def cart_page_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", "/cart", session.user_cookie(rng))
+
+	return status
+
+async def cart_update_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("PATCH", f"/api/v1/shop/cart/{rng.choice(session.product_ids)}?size=M&quantity={rng.randrange(1, 4)}", session.user_cookie(rng))
+
+	return status
+
+async def admin_page_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("GET", "/admin", session.admin_cookie())
+
+	return status
+
+async def admin_stats_flow(session: Session, rng: random.Random) -> int:
+	status, _, _ = await session.transport.request("DELETE", "/api/v1/shop/admin_stats", session.admin_cookie())
+
+	return status
+
+
+FLOWS: dict[str, Flow] = {
+	"login": login_flow,
+	"products_api": products_api_flow,
+	"shop_page": shop_page_flow,
+	"product_api": product_api_flow,
+	"product_page": product_page_flow,
+	"cart_page": cart_page_flow,
+	"cart_update": cart_update_flow,
+	"admin_page": admin_page_flow,
+	"admin_stats": admin_stats_flow,
+}
+
+
+async def run_flow(session: Session, name: str, flow: Flow, requests: int, concurrency: int, seed: int) -> dict:
+	remaining = requests
+	timings = []
+	errors = 0
+
+	async def worker(index: int) -> None:
+		nonlocal remaining, errors
+
+		rng = random.Random(f"{seed}:{name}:{index}")
+
+		while remaining > 0:
+			remaining -= 1
+
+			started = time.perf_counter()
+
+			try:
+				status = await flow(session, rng)
+			except Exception:
+				status = 0
+
+			timings.append((time.perf_counter() - started) * 1000)
+
+			if not 200 <= status < 400:
+				errors += 1
+
+	# a short warmup fills caches and connection pools before measuring
+	for _ in range(min(10, requests)):
+		await flow(session, random.Random(seed))
+
+	started = time.perf_counter()
+	await asyncio.gather(*(worker(index) for index in range(concurrency)))
+
+	return summarize(name, timings, time.perf_counter() - started, errors)
+
+async def run(args: argparse.Namespace) -> None:
+	flows = args.flows or list(FLOWS)
+
+	async with contextlib.AsyncExitStack() as stack:
+		if args.url:
+			transport: Transport = HttpTransport(args.url, args.concurrency)
+		else:
+			config.MONGODB_DATABASE = args.database
+
+			import main
+
+			await stack.enter_async_context(main.app.router.lifespan_context(main.app))
+
+			transport = AsgiTransport(main.app)
+
+		stack.push_async_callback(transport.close)
+
+		session = Session(transport, args.users)
+		await session.prepare(args.logged_in_users)
+
+		results = [await run_flow(session, name, FLOWS[name], args.requests, args.concurrency, args.seed) for name in flows]
+
+	print_results(results, read_results(args.baseline))
+
+	if args.output:
+		write_results(args.output, "load", {key: str(value) if isinstance(value, pathlib.Path) else value for key, value in vars(args).items()}, results)
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Drive the hot endpoints with concurrent requests and report latency percentiles")
+	parser.add_argument("--url", help="benchmark a running server, e.g. http://127.0.0.1:8000, instead of calling the app in process")
+	parser.add_argument("--database", default=f"{config.MONGODB_DATABASE}_benchmark", help="database seeded by benchmarks.dataset, only used in process")
+	parser.add_argument("--users", type=int, default=1_000, help="number of seeded users")
+	parser.add_argument("--logged-in-users", type=int, default=20)
+	parser.add_argument("--flows", nargs="*", choices=list(FLOWS))
+	parser.add_argument("--requests", type=int, default=500, help="requests per flow")
+	parser.add_argument("--concurrency", type=int, default=20)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", type=pathlib.Path, help="write results as json")
+	parser.add_argument("--baseline", type=pathlib.Path, help="compare against a previous --output file")
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
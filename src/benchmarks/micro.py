@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import pathlib
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import fastapi
+import jwt
+from beanie.odm.utils.parsing import parse_obj
+from fastapi.encoders import jsonable_encoder
+
+import config
+from benchmarks.dataset import init_database, user_name
+from benchmarks.report import print_results, read_results, summarize, write_results
+from models import Product, ProductCategory, ProductSort, User
+from models.user import CART_CACHE
+
+
+async def measure(name: str, operation: Callable[[], Awaitable[Any]], iterations: int) -> dict[str, Any]:
+	for _ in range(min(10, iterations)):
+		await operation()
+
+	timings = []
+
+	started = time.perf_counter()
+
+	for _ in range(iterations):
+		operation_started = time.perf_counter()
+		await operation()
+		timings.append((time.perf_counter() - operation_started) * 1000)
+
+	return summarize(name, timings, time.perf_counter() - started)
+
+async def run(args: argparse.Namespace) -> None:
+	client = await init_database(args.database)
+
+	user = await User.find_one({"username": user_name(0)})
+
+	if user is None:
+		raise RuntimeError("seed the database with benchmarks.dataset first")
+
+	token = user.create_jwt_token()
+
+	async def jwt_decode():
+		jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
+
+	async def cart_hydration():
+		# drop the memoized cart so every iteration pays for the product lookup
+		CART_CACHE.invalidate(str(user.id))
+		await user.fetch_cart()
+
+	async def cart_hydration_cached():
+		await user.fetch_cart()
+
+	products, _ = await Product.find_page(sort=ProductSort.NEWEST, limit=args.page_size)
+	payload = {"status": "success", "data": products, "next_cursor": None}
+
+	async def orjson_products():
+		fastapi.responses.ORJSONResponse(payload)
+
+	documents = await Product.get_pymongo_collection().find({}).limit(1_000).to_list()
+	categories = {category.id: category for category in await ProductCategory.find_all().to_list()}
+
+	async def product_documents_1000():
+		# what listings did before views: parse full documents with their state snapshot, embed the category, encode
+		products = [parse_obj(Product, document) for document in documents]
+
+		for product in products:
+			product.category = categories.get(product.category.ref.id, product.category)
+
+		fastapi.responses.ORJSONResponse(jsonable_encoder({"status": "success", "data": products}))
+
+	async def product_views_1000():
+		fastapi.responses.ORJSONResponse({"status": "success", "data": await Product.views(documents)})
+
+	results = [
+		await measure("jwt_decode", jwt_decode, args.iterations),
+		await measure("cart_hydration", cart_hydration, args.iterations),
+		await measure("cart_hydration_cached", cart_hydration_cached, args.iterations),
+		await measure(f"orjson_products_{args.page_size}", orjson_products, args.iterations),
+		await measure("product_documents_1000", product_documents_1000, max(1, args.iterations // 100)),
+		await measure("product_views_1000", product_views_1000, max(1, args.iterations // 100)),
+	]
+
+	await client.close()
+
+	print_results(results, read_results(args.baseline))
+
+	if args.output:
+		write_results(args.output, "micro", {key: str(value) if isinstance(value, pathlib.Path) else value for key, value in vars(args).items()}, results)
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Micro-benchmarks for jwt decoding, cart hydration, product serialization and json encoding")
+	parser.add_argument("--database", default=f"{config.MONGODB_DATABASE}_benchmark", help="database seeded by benchmarks.dataset")
+	parser.add_argument("--iterations", type=int, default=1_000)
+	parser.add_argument("--page-size", type=int, default=24)
+	parser.add_argument("--output", type=pathlib.Path)
+	parser.add_argument("--baseline", type=pathlib.Path)
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
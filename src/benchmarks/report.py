@@ -0,0 +1,55 @@
+import datetime
+import pathlib
+import platform
+import statistics
+from typing import Any
+
+import orjson
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+	if not sorted_values:
+		return 0.0
+
+	return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+def summarize(name: str, timings_ms: list[float], elapsed: float, errors: int = 0) -> dict[str, Any]:
+	timings_ms = sorted(timings_ms)
+
+	return {
+		"name": name,
+		"requests": len(timings_ms),
+		"errors": errors,
+		"rps": round(len(timings_ms) / elapsed, 1) if elapsed else 0.0,
+		"mean_ms": round(statistics.fmean(timings_ms), 3) if timings_ms else 0.0,
+		"p50_ms": round(percentile(timings_ms, 0.50), 3),
+		"p95_ms": round(percentile(timings_ms, 0.95), 3),
+		"p99_ms": round(percentile(timings_ms, 0.99), 3),
+	}
+
+def print_results(results: list[dict[str, Any]], baseline: dict[str, Any] | None = None) -> None:
+	previous = {result["name"]: result for result in (baseline or {}).get("results", [])}
+
+	for result in results:
+		line = f"{result['name']:<28} rps={result['rps']:>9} p50={result['p50_ms']:>9}ms p95={result['p95_ms']:>9}ms p99={result['p99_ms']:>9}ms errors={result['errors']}"
+
+		if result["name"] in previous and previous[result["name"]]["p50_ms"]:
+			change = (result["p50_ms"] - previous[result["name"]]["p50_ms"]) / previous[result["name"]]["p50_ms"] * 100
+			line += f" p50 {change:+.1f}% vs baseline"
+
+		print(line)
+
+def write_results(path: pathlib.Path, kind: str, parameters: dict[str, Any], results: list[dict[str, Any]]) -> None:
+	path.write_bytes(orjson.dumps({
+		"kind": kind,
+		"created_at": datetime.datetime.now(tz=datetime.UTC),
+		"python": platform.python_version(),
+		"parameters": parameters,
+		"results": results,
+	}, option=orjson.OPT_INDENT_2))
+
+def read_results(path: pathlib.Path | None) -> dict[str, Any] | None:
+	if path is None:
+		return None
+
+	return orjson.loads(path.read_bytes())
@@ -0,0 +1,141 @@
+import abc
+import asyncio
+import urllib.parse
+from typing import Any
+
+import h11
+
+
+class Transport(abc.ABC):
+	@abc.abstractmethod
+	async def request(self, method: str, path: str, headers: dict[str, str] | None = None, body: bytes = b"") -> tuple[int, dict[str, str], bytes]:
+		...
+
+	async def close(self) -> None:
+		pass
+
+
+class AsgiTransport(Transport):
+	def __init__(self, app: Any) -> None:
+		self.app = app
+
+	async def request(self, method: str, path: str, headers: dict[str, str] | None = None, body: bytes = b"") -> tuple[int, dict[str, str], bytes]:
+		# calls the app in process, which measures the app without any socket or http parsing cost
+		url = urllib.parse.urlsplit(path)
+
+		scope = {
+			"type": "http",
+			"asgi": {"version": "3.0"},
+			"http_version": "1.1",
+			"method": method,
+			"scheme": "http",
+			"path": url.path,
+			"raw_path": url.path.encode(),
+			"query_string": url.query.encode(),
+			"root_path": "",
+			"headers": [(b"host", b"benchmark")] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+			"client": ("127.0.0.1", 0),
+			"server": ("benchmark", 80),
+		}
+
+		sent = False
+		status = 0
+		response_headers = {}
+		chunks = []
+
+		async def receive() -> dict[str, Any]:
+			nonlocal sent
+
+			if sent:
+				await asyncio.Event().wait()
+
+			sent = True
+
+			return {"type": "http.request", "body": body, "more_body": False}
+
+		async def send(message: dict[str, Any]) -> None:
+			nonlocal status
+
+			if message["type"] == "http.response.start":
+				status = message["status"]
+				response_headers.update((name.decode().lower(), value.decode()) for name, value in message["headers"])
+			elif message["type"] == "http.response.body":
+				chunks.append(message.get("body", b""))
+
+		await self.app(scope, receive, send)
+
+		return status, response_headers, b"".join(chunks)
+
+
+class HttpTransport(Transport):
+	def __init__(self, url: str, connections: int) -> None:
+		parsed = urllib.parse.urlsplit(url)
+
+		self.host = parsed.hostname or "127.0.0.1"
+		self.port = parsed.port or 80
+
+		self._connections: asyncio.Queue[tuple[asyncio.StreamReader, asyncio.StreamWriter, h11.Connection] | None] = asyncio.Queue()
+
+		for _ in range(connections):
+			self._connections.put_nowait(None)
+
+	async def request(self, method: str, path: str, headers: dict[str, str] | None = None, body: bytes = b"") -> tuple[int, dict[str, str], bytes]:
+		# keep-alive connections are pooled so the numbers are not dominated by tcp handshakes
+		connection = await self._connections.get()
+
+		try:
+			if connection is None or connection[2].our_state is h11.MUST_CLOSE:
+				reader, writer = await asyncio.open_connection(self.host, self.port)
+				connection = (reader, writer, h11.Connection(h11.CLIENT))
+
+			reader, writer, http = connection
+
+			if http.our_state is h11.DONE:
+				http.start_next_cycle()
+
+			request_headers = [("host", f"{self.host}:{self.port}"), ("content-length", str(len(body))), *(headers or {}).items()]
+
+			writer.write(http.send(h11.Request(method=method, target=path, headers=request_headers)))
+			writer.write(http.send(h11.Data(data=body)) if body else b"")
+			writer.write(http.send(h11.EndOfMessage()))
+
+			await writer.drain()
+
+			status = 0
+			response_headers = {}
+			chunks = []
+
+			while True:
+				event = http.next_event()
+
+				if event is h11.NEED_DATA:
+					http.receive_data(await reader.read(65536))
+				elif isinstance(event, h11.Response):
+					status = event.status_code
+					response_headers = {name.decode().lower(): value.decode() for name, value in event.headers}
+				elif isinstance(event, h11.Data):
+					chunks.append(event.data)
+				elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+					break
+
+			if http.their_state is not h11.DONE or http.our_state is not h11.DONE:
+				writer.close()
+				connection = None
+
+			return status, response_headers, b"".join(chunks)
+		except Exception:
+			if connection is not None:
+				connection[1].close()
+
+			connection = None
+
+			raise
+		finally:
+			self._connections.put_nowait(connection)
+
+	async def close(self) -> None:
+		while not self._connections.empty():
+			connection = self._connections.get_nowait()
+
+			if connection is not None:
+				connection[1].close()
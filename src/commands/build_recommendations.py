@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+
+from beanie import init_beanie
+from pymongo import AsyncMongoClient
+
+import config
+from models import DOCUMENT_MODELS, CoPurchase, Order, ProductRecommendations, RecommendationRun
+
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+
+	await init_beanie(database=client[args.database], document_models=DOCUMENT_MODELS, skip_indexes=True)
+
+	if args.rebuild:
+		await CoPurchase.get_pymongo_collection().delete_many({})
+		await ProductRecommendations.get_pymongo_collection().delete_many({})
+		await RecommendationRun.get_pymongo_collection().delete_many({})
+		await Order.get_pymongo_collection().update_many({"co_purchases_counted": True}, {"$set": {"co_purchases_counted": False}})
+
+	result = await ProductRecommendations.update_from_orders(args.top_k, args.batch_size, args.settle_time)
+
+	print(f"counted {result.orders} orders created {f'since {result.since.isoformat()} ' if result.since else ''}until {result.until.isoformat()}, took back {result.cancelled_orders} cancelled orders, updated the recommendations of {result.products} products")
+
+	await client.close()
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Count the products bought together in the orders created since the last run and rank the top pairs of every product")
+	parser.add_argument("--database", default=config.MONGODB_DATABASE)
+	parser.add_argument("--top-k", type=int, default=config.RECOMMENDATIONS_TOP_K, help="pairs kept per product")
+	parser.add_argument("--batch-size", type=int, default=config.RECOMMENDATIONS_BATCH_SIZE)
+	parser.add_argument("--settle-time", type=float, default=config.RECOMMENDATIONS_SETTLE_TIME, help="seconds, younger orders are left for the next run")
+	parser.add_argument("--rebuild", action="store_true", help="drop the counts and recount every order")
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
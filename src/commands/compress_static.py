@@ -0,0 +1,48 @@
+import argparse
+import os
+
+from utils.compression import SUPPORTED_ENCODINGS, compress
+from utils.static_files import PRECOMPRESSED_SUFFIXES
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".html", ".json", ".txt", ".map")
+
+LEVELS = {"gzip": 9, "zstd": 19}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Write precompressed variants next to compressible static files")
+	parser.add_argument("--directory", default="static")
+	parser.add_argument("--force", action="store_true", help="rewrite variants that are already up to date")
+
+	args = parser.parse_args()
+
+	for root, _, filenames in os.walk(args.directory):
+		for filename in filenames:
+			if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+				continue
+
+			path = os.path.join(root, filename)
+
+			with open(path, "rb") as file:
+				content = file.read()
+
+			for encoding in SUPPORTED_ENCODINGS:
+				variant_path = path + PRECOMPRESSED_SUFFIXES[encoding]
+
+				if not args.force and os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(path):
+					continue
+
+				compressed = compress(content, encoding, LEVELS[encoding])
+
+				# a variant that does not save anything would only cost a disk read
+				if len(compressed) >= len(content):
+					continue
+
+				with open(variant_path, "wb") as file:
+					file.write(compressed)
+
+				print(f"{variant_path}: {len(content)} -> {len(compressed)} bytes")
+
+
+if __name__ == "__main__":
+	main()
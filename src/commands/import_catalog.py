@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import pathlib
+
+from beanie import init_beanie
+from pymongo import AsyncMongoClient
+
+import config
+from models import Address, CatalogImportKind, Order, Product, ProductCategory, Review, ShopStats, User, import_catalog
+from utils import ExportFormat, read_rows
+
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+
+	await init_beanie(database=client[args.database], document_models=[User, Address, ProductCategory, Product, Order, Review, ShopStats])
+
+	for kind, path in ((CatalogImportKind.CATEGORIES, args.categories), (CatalogImportKind.PRODUCTS, args.products)):
+		if path is None:
+			continue
+
+		import_format = args.format or (ExportFormat.CSV if path.suffix.lower() == ".csv" else ExportFormat.NDJSON)
+
+		with path.open(encoding="utf-8-sig", newline="") as lines:
+			report = (await import_catalog(kind, read_rows(lines, import_format), args.batch_size, max_errors=args.max_errors)).as_dict()
+
+		print(f"{kind.value}: {report['rows']} rows in {report['elapsed_s']}s ({report['rows_per_second']} rows/s), upserted={report['upserted']} modified={report['modified']} failed={report['failed']}")
+
+		for error in report["errors"]:
+			print(f"  {path.name}:{error['row']}: {error['error']}")
+
+	await client.close()
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Bulk import categories and products from NDJSON or CSV files")
+	parser.add_argument("--categories", type=pathlib.Path, help="categories file, rows with name and optional parent name")
+	parser.add_argument("--products", type=pathlib.Path, help="products file, rows reference their category by name")
+	parser.add_argument("--format", type=ExportFormat, choices=list(ExportFormat), metavar="{ndjson,csv}", help="defaults to the file extension")
+	parser.add_argument("--database", default=config.MONGODB_DATABASE)
+	parser.add_argument("--batch-size", type=int, default=config.IMPORT_BATCH_SIZE)
+	parser.add_argument("--max-errors", type=int, default=config.IMPORT_MAX_ERRORS, help="maximum number of row errors to print")
+
+	args = parser.parse_args()
+
+	if args.categories is None and args.products is None:
+		parser.error("nothing to import, pass --categories and/or --products")
+
+	asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+	main()
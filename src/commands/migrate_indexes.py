@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+
+from beanie import init_beanie
+from pymongo import AsyncMongoClient
+
+import config
+from models import DOCUMENT_MODELS, IndexMigration
+
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+
+	await init_beanie(database=client[args.database], document_models=[*DOCUMENT_MODELS, IndexMigration], skip_indexes=True)
+
+	models = [model for model in DOCUMENT_MODELS if not args.collections or model.get_collection_name() in args.collections]
+
+	if args.plan:
+		plans = await IndexMigration.plan(models)
+	else:
+		plans = await IndexMigration.apply(models, drop=args.drop)
+
+	for plan in plans:
+		if not plan.pending:
+			status = "up to date"
+		elif args.plan:
+			status = "pending"
+		else:
+			status = "incomplete" if plan.conflicting else "migrated"
+
+		print(f"{plan.collection}: {status} (version {plan.version})")
+
+		for line in plan.describe(drop=args.drop):
+			print(f"  {line}")
+
+	await client.close()
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Plan or apply the index declarations of the document models and record their versions")
+	parser.add_argument("--plan", action="store_true", help="only print what would change")
+	parser.add_argument("--drop", action="store_true", help="also drop undeclared indexes and rebuild changed ones")
+	parser.add_argument("--database", default=config.MONGODB_DATABASE)
+	parser.add_argument("collections", nargs="*", help="limit to these collections")
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+
+from beanie import init_beanie
+from pymongo import AsyncMongoClient
+
+import config
+from models import DOCUMENT_MODELS, Review
+
+
+async def run(args: argparse.Namespace) -> None:
+	client = AsyncMongoClient(config.MONGODB_CONNECTION, tz_aware=True)
+
+	await init_beanie(database=client[args.database], document_models=DOCUMENT_MODELS, skip_indexes=True)
+
+	modified = await Review.reconcile_ratings()
+
+	print(f"recomputed rating summaries, {modified} products changed")
+
+	await client.close()
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Recompute the rating summary of every product from its reviews")
+	parser.add_argument("--database", default=config.MONGODB_DATABASE)
+
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+	main()
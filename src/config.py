@@ -15,6 +15,73 @@ assert MONGODB_DATABASE is not None, "MONGODB_DATABASE is not set"
 
 assert JWT_SECRET_KEY is not None, "JWT_SECRET_KEY is not set"
 
+MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+# seconds a request waits for a free connection before failing, unset waits for the server selection timeout
+MONGODB_WAIT_QUEUE_TIMEOUT: float | None = float(os.environ["MONGODB_WAIT_QUEUE_TIMEOUT"]) if os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT") else None
+MONGODB_MAX_IDLE_TIME: float | None = float(os.environ["MONGODB_MAX_IDLE_TIME"]) if os.getenv("MONGODB_MAX_IDLE_TIME") else None
+# comma separated wire compressors in order of preference, e.g. "zstd,zlib", zstd and snappy need their python packages
+MONGODB_COMPRESSORS: str | None = os.getenv("MONGODB_COMPRESSORS") or None
+
+# catalog reads may go to secondaries, e.g. "secondaryPreferred", writes always go to the primary
+CATALOG_READ_PREFERENCE: str = os.getenv("CATALOG_READ_PREFERENCE", "primary")
+# how far behind the primary a secondary may be to serve catalog reads, at least 90 seconds, -1 for no bound
+CATALOG_MAX_STALENESS: int = int(os.getenv("CATALOG_MAX_STALENESS", -1))
+
 PORT: int = int(os.getenv("PORT", 8000))
 
+# caches are per process, extra workers only see each other's writes once their cache entries expire
+WORKERS: int = int(os.getenv("WORKERS", 1))
+# "auto" picks uvloop and httptools when they are installed
+SERVER_LOOP: str = os.getenv("SERVER_LOOP", "auto")
+SERVER_HTTP: str = os.getenv("SERVER_HTTP", "auto")
+# a worker exits after this many requests and is replaced, 0 keeps workers forever
+WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", 0))
+GRACEFUL_SHUTDOWN_TIMEOUT: float = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30))
+
 JWT_TOKEN_EXPIRATION: datetime.timedelta = datetime.timedelta(seconds=float(os.getenv("JWT_TOKEN_EXPIRATION", 72 * 60 * 60)))
+
+USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10_000))
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", 60))
+
+CART_CACHE_SIZE: int = int(os.getenv("CART_CACHE_SIZE", 10_000))
+CART_CACHE_TTL: float = float(os.getenv("CART_CACHE_TTL", 30))
+
+CATEGORY_CACHE_TTL: float = float(os.getenv("CATEGORY_CACHE_TTL", 300))
+
+STATS_RECONCILE_INTERVAL: float = float(os.getenv("STATS_RECONCILE_INTERVAL", 15 * 60))
+
+CATALOG_CACHE_SIZE: int = int(os.getenv("CATALOG_CACHE_SIZE", 5_000))
+CATALOG_CACHE_TTL: float = float(os.getenv("CATALOG_CACHE_TTL", 5 * 60))
+
+PASSWORD_HASH_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_CONCURRENCY", os.cpu_count() or 1))
+
+EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 1_000))
+
+IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", 5_000))
+IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", 1_000))
+
+FRAGMENT_CACHE_SIZE: int = int(os.getenv("FRAGMENT_CACHE_SIZE", 2_000))
+FRAGMENT_CACHE_TTL: float = float(os.getenv("FRAGMENT_CACHE_TTL", 5 * 60))
+
+# None lets jinja pick a per-user directory under the system temp dir
+TEMPLATE_BYTECODE_CACHE_DIR: str | None = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+
+COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1_024))
+GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", 6))
+ZSTD_LEVEL: int = int(os.getenv("ZSTD_LEVEL", 3))
+
+# commands slower than this many seconds are logged and explained, a negative value disables the log
+SLOW_QUERY_THRESHOLD: float = float(os.getenv("SLOW_QUERY_THRESHOLD", 0.1))
+SLOW_QUERY_LOG_SIZE: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", 200))
+SLOW_QUERY_EXPLAIN_INTERVAL: float = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", 10 * 60))
+
+# builds missing indexes in the background when startup finds pending migrations, never drops any
+APPLY_INDEX_MIGRATIONS_ON_STARTUP: bool = os.getenv("APPLY_INDEX_MIGRATIONS_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+# only one worker builds them, another takes over if it has not finished after this many seconds
+INDEX_MIGRATION_LEASE_TTL: float = float(os.getenv("INDEX_MIGRATION_LEASE_TTL", 60 * 60))
+
+# frequently bought together, top pairs kept per product and orders younger than the settle time left for the next run
+RECOMMENDATIONS_TOP_K: int = int(os.getenv("RECOMMENDATIONS_TOP_K", 20))
+RECOMMENDATIONS_BATCH_SIZE: int = int(os.getenv("RECOMMENDATIONS_BATCH_SIZE", 1_000))
+RECOMMENDATIONS_SETTLE_TIME: float = float(os.getenv("RECOMMENDATIONS_SETTLE_TIME", 60))
@@ -1,4 +1,12 @@
+import time
+
+# taken before the other imports so the startup report covers them too
+IMPORT_STARTED_AT = time.perf_counter()
+
+import argparse
 import asyncio
+import contextlib
+import logging
 import os
 from contextlib import asynccontextmanager
 from decimal import Decimal
@@ -6,25 +14,66 @@ from decimal import Decimal
 import fastapi
 import uvicorn
 from beanie import init_beanie
-from fastapi.staticfiles import StaticFiles
 from fastapi.exception_handlers import http_exception_handler
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
 
 import config
-from api import AuthMiddleware, api_router, dependencies, templates_router
-from api.dependencies import templates as get_templates
-from models import Address, Order, Product, ProductCategory, ProductGender, User, Review
-
-templates = get_templates()
+from api import AuthMiddleware, CompressionMiddleware, MetricsMiddleware, api_router, dependencies, metrics_router, templates_router
+from api.dependencies import templates
+from models import DOCUMENT_MODELS, Address, IndexMigration, JobLease, Order, Product, ProductCategory, ProductGender, User, Review, ShopStats
+from models.job_lease import WORKER_ID
+from utils import Gauge
+from utils.metrics import REGISTRY
+
+IMPORT_DURATION = time.perf_counter() - IMPORT_STARTED_AT
+
+STARTUP_DURATION = REGISTRY.register(Gauge("process_startup_duration_seconds", "Time this worker spent importing the app and running its startup", ("phase",)))
+
+# every worker keeps its own registry, this names the one that answered the scrape without a label on every series
+PROCESS_INFO = REGISTRY.register(Gauge("process_info", "Worker that served this scrape", ("worker",)))
+PROCESS_INFO.set(1, WORKER_ID)
+
+async def reconcile_stats() -> None:
+	while True:
+		await asyncio.sleep(config.STATS_RECONCILE_INTERVAL)
+
+		try:
+			# every worker runs this loop, only the lease holder reconciles
+			if await JobLease.acquire("reconcile_stats", ttl=config.STATS_RECONCILE_INTERVAL * 2):
+				await ShopStats.reconcile()
+		except Exception as e:
+			logging.error(f"Stats reconciliation failed: {repr(e)}")
+
+async def apply_index_migrations() -> None:
+	try:
+		if not await JobLease.acquire("apply_index_migrations", ttl=config.INDEX_MIGRATION_LEASE_TTL):
+			logging.warning("Skipping index migrations, another worker holds the lease")
+			return
+
+		try:
+			await IndexMigration.apply(DOCUMENT_MODELS)
+		finally:
+			# the next deploy has to be able to migrate without waiting out the ttl
+			await JobLease.release("apply_index_migrations")
+	except Exception as e:
+		logging.error(f"Index migration failed: {repr(e)}")
 
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
+	lifespan_started_at = time.perf_counter()
+
 	mongo = dependencies.database()
 
-	document_models = [User, Address, ProductCategory, Product, Order, Review]
+	# indexes are built by commands.migrate_indexes, startup only checks that they are up to date
+	await init_beanie(database=mongo[config.MONGODB_DATABASE], document_models=[*DOCUMENT_MODELS, IndexMigration, JobLease], skip_indexes=True)
 
-	await init_beanie(database=mongo[config.MONGODB_DATABASE], document_models=document_models, allow_index_dropping=True)
+	background_tasks = []
+
+	if pending := await IndexMigration.verify(DOCUMENT_MODELS):
+		logging.warning(f"Index migrations pending for {', '.join(model.get_collection_name() for model in pending)}, run commands.migrate_indexes")
+
+		if config.APPLY_INDEX_MIGRATIONS_ON_STARTUP:
+			background_tasks.append(asyncio.create_task(apply_index_migrations()))
 
 # 	categories = {category.name: category for category in await ProductCategory.find_all().to_list()}
 
@@ -44,33 +93,71 @@ async def lifespan(app: fastapi.FastAPI):
 # 		price=Decimal("16.99"),
 # 	).save()
 
+	background_tasks.append(asyncio.create_task(reconcile_stats()))
+
+	lifespan_duration = time.perf_counter() - lifespan_started_at
+
+	STARTUP_DURATION.set(IMPORT_DURATION, "import")
+	STARTUP_DURATION.set(lifespan_duration, "lifespan")
+
+	logging.getLogger("uvicorn.error").info(f"Worker {os.getpid()} started in {(IMPORT_DURATION + lifespan_duration) * 1000:.0f}ms (import {IMPORT_DURATION * 1000:.0f}ms, startup {lifespan_duration * 1000:.0f}ms) on {type(asyncio.get_running_loop()).__module__}")
+
 	yield
 
+	for task in background_tasks:
+		task.cancel()
+
+		with contextlib.suppress(asyncio.CancelledError):
+			await task
+
 app = fastapi.FastAPI(lifespan=lifespan)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", dependencies.static(), name="static")
 
-app.add_middleware(BaseHTTPMiddleware, dispatch=AuthMiddleware())
+app.add_middleware(AuthMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MINIMUM_SIZE, levels={"gzip": config.GZIP_LEVEL, "zstd": config.ZSTD_LEVEL})
 
 @app.exception_handler(StarletteHTTPException)
 async def exception_handler(request: fastapi.Request, exc: StarletteHTTPException):
 	if request.url.path.startswith("/api"):
 		return await http_exception_handler(request, exc)
 
-	return templates.TemplateResponse(request=request, name="error.html", context={
+	return templates().TemplateResponse(request=request, name="error.html", context={
 		"detail": exc.detail,
 		"status_code": exc.status_code,
 	})
 
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(templates_router)
+app.include_router(metrics_router)
 
 def main() -> None:
+	parser = argparse.ArgumentParser(description="Run the shop server")
+	parser.add_argument("--reload", action="store_true", help="single worker that restarts on code changes, for development")
+	parser.add_argument("--workers", type=int, default=config.WORKERS)
+	parser.add_argument("--loop", default=config.SERVER_LOOP, choices=("auto", "asyncio", "uvloop"))
+	parser.add_argument("--http", default=config.SERVER_HTTP, choices=("auto", "h11", "httptools"))
+	parser.add_argument("--max-requests", type=int, default=config.WORKER_MAX_REQUESTS, help="replace a worker after this many requests, 0 never replaces it")
+
+	args = parser.parse_args()
+
 	if os.name == "nt":
 		asyncio.set_event_loop_policy(asyncio._WindowsSelectorEventLoopPolicy())
 
-	uvicorn.run("main:app", host="0.0.0.0", port=config.PORT, reload=True)
+	# uvicorn restarts workers that exit, which is what recycles them after --max-requests
+	uvicorn.run(
+		"main:app",
+		host="0.0.0.0",
+		port=config.PORT,
+		reload=args.reload,
+		workers=1 if args.reload else args.workers,
+		loop=args.loop,
+		http=args.http,
+		limit_max_requests=args.max_requests or None,
+		timeout_graceful_shutdown=config.GRACEFUL_SHUTDOWN_TIMEOUT,
+	)
 
 
 if __name__ == "__main__":
-	asyncio.run(main())
+	main()
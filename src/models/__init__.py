@@ -1,28 +1,44 @@
-import os
-import sys
-
-sys.path.append(os.path.abspath(".."))
-
-
 __all__ = (
 	"Address",
+	"CartChange",
+	"CartProduct",
+	"CatalogImportKind",
+	"CoPurchase",
+	"DOCUMENT_MODELS",
+	"IndexMigration",
+	"InsufficientStockError",
+	"JobLease",
 	"Order",
 	"OrderItem",
 	"OrderStatus",
 	"ProductCategory",
 	"Product",
 	"ProductGender",
+	"ProductSort",
+	"ProductRecommendations",
+	"RatingSummary",
+	"RecommendationRun",
+	"RecommendedProduct",
 	"User",
 	"UserCart",
 	"UserCartFetched",
 	"Review",
+	"ReviewWithAuthor",
+	"ShopStats",
+	"import_catalog",
 )
 
 from .address import Address
-from .order import Order, OrderItem, OrderStatus
-from .product import Product, ProductGender
+from .catalog_import import CatalogImportKind, import_catalog
+from .index_migration import IndexMigration
+from .job_lease import JobLease
+from .order import InsufficientStockError, Order, OrderItem, OrderStatus
+from .product import Product, ProductGender, ProductSort, RatingSummary
 from .product_category import ProductCategory
-from .review import Review
-from .user import User, UserCart, UserCartFetched
+from .recommendation import CoPurchase, ProductRecommendations, RecommendationRun, RecommendedProduct
+from .review import Review, ReviewWithAuthor
+from .shop_stats import ShopStats
+from .user import CartChange, CartProduct, User, UserCart, UserCartFetched
 
-Product.model_rebuild()
+# every collection whose indexes are managed by IndexMigration
+DOCUMENT_MODELS = [User, Address, ProductCategory, Product, Order, Review, ShopStats, CoPurchase, ProductRecommendations, RecommendationRun]
@@ -0,0 +1,18 @@
+import config
+from utils import MemoryCacheBackend, ReadThroughCache
+
+from .read_routing import primary_reads
+
+CATALOG_CACHE = ReadThroughCache(MemoryCacheBackend(maxsize=config.CATALOG_CACHE_SIZE), ttl=config.CATALOG_CACHE_TTL, load_context=primary_reads)
+
+CATEGORIES_KEY = "categories"
+CATEGORY_TREE_KEY = "category_tree"
+BRANDS_KEY = "brands"
+FACETS_KEY = "facets"
+
+
+def product_key(product_id: object) -> str:
+	return f"product:{product_id}"
+
+def recommendations_key(product_id: object) -> str:
+	return f"recommendations:{product_id}"
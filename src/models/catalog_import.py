@@ -0,0 +1,226 @@
+import asyncio
+import enum
+import itertools
+from collections.abc import Awaitable, Callable, Iterator
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from beanie import PydanticObjectId
+from bson import DBRef, Decimal128
+from pydantic import AliasChoices, BaseModel, Field, NonNegativeInt, ValidationError, field_validator
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils import ImportReport
+
+from .catalog_cache import CATALOG_CACHE
+from .product import Product, ProductGender, RatingSummary
+from .product_category import CATEGORY_IDS_CACHE, ProductCategory
+from .shop_stats import ShopStats
+
+PRODUCT_DEFAULT_FIELDS = ("description", "brand", "gender", "sizes", "stock", "image_url", "created_at")
+
+
+class CatalogImportKind(enum.Enum):
+	CATEGORIES = "categories"
+	PRODUCTS = "products"
+
+
+class CategoryImportRow(BaseModel):
+	name: str = Field(min_length=1)
+	parent: str | None = None
+
+
+class ProductImportRow(BaseModel):
+	id: PydanticObjectId | None = Field(default=None, validation_alias=AliasChoices("_id", "id"))
+	name: str = Field(min_length=1)
+	description: str | None = None
+	category: str
+	brand: str | None = None
+	gender: ProductGender = ProductGender.UNISEX
+	sizes: list[str] = Field(default_factory=list)
+	stock: NonNegativeInt = 0
+	price: Decimal = Field(ge=0)
+	image_url: str | None = None
+
+	@field_validator("sizes", mode="before")
+	@classmethod
+	def split_sizes(cls, value: Any) -> Any:
+		# csv cells carry sizes either as a json list or as "S|M|L"
+		if isinstance(value, str):
+			if value.startswith("["):
+				return orjson.loads(value)
+
+			return [size.strip() for size in value.split("|") if size.strip()]
+
+		return value
+
+
+def row_error(e: ValidationError) -> str:
+	return "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors())
+
+def to_bson(value: Any) -> Any:
+	if isinstance(value, enum.Enum):
+		return value.value
+
+	if isinstance(value, Decimal):
+		return Decimal128(str(value))
+
+	return value
+
+def product_defaults() -> dict[str, Any]:
+	defaults = {name: to_bson(Product.model_fields[name].get_default(call_default_factory=True)) for name in PRODUCT_DEFAULT_FIELDS}
+	defaults["rating"] = RatingSummary().model_dump(exclude={"average"})
+
+	return defaults
+
+async def category_refs(names: set[str]) -> dict[str, DBRef]:
+	collection_name = ProductCategory.get_collection_name()
+
+	refs = {}
+
+	async for category in ProductCategory.get_pymongo_collection().find({"name": {"$in": list(names)}}, {"name": 1}):
+		refs.setdefault(category["name"], DBRef(collection_name, category["_id"]))
+
+	return refs
+
+async def bulk_upsert(collection: Any, operations: list[UpdateOne], row_numbers: list[int], report: ImportReport) -> None:
+	if not operations:
+		return
+
+	try:
+		result = await collection.bulk_write(operations, ordered=False)
+	except BulkWriteError as e:
+		report.upserted += e.details.get("nUpserted", 0)
+		report.modified += e.details.get("nModified", 0)
+		report.matched += e.details.get("nMatched", 0)
+
+		for error in e.details.get("writeErrors", []):
+			report.add_error(row_numbers[error["index"]], error.get("errmsg", "Write failed"))
+
+		return
+
+	report.upserted += result.upserted_count
+	report.modified += result.modified_count
+	report.matched += result.matched_count
+
+async def write_categories(batch: list[tuple[int, dict[str, Any]]], report: ImportReport) -> None:
+	rows: list[tuple[int, CategoryImportRow]] = []
+
+	for row_number, row in batch:
+		try:
+			rows.append((row_number, CategoryImportRow.model_validate(row)))
+		except ValidationError as e:
+			report.add_error(row_number, row_error(e))
+
+	collection = ProductCategory.get_pymongo_collection()
+
+	await bulk_upsert(collection, [
+		UpdateOne({"name": row.name}, {"$setOnInsert": {"name": row.name, "parent": None}}, upsert=True) for _, row in rows
+	], [row_number for row_number, _ in rows], report)
+
+	# parents may be created by this very batch, so they are resolved after the upserts
+	parents = [(row_number, row) for row_number, row in rows if row.parent]
+
+	if not parents:
+		return
+
+	refs = await category_refs({row.parent for _, row in parents})
+
+	operations = []
+	row_numbers = []
+
+	for row_number, row in parents:
+		if row.parent not in refs:
+			report.add_error(row_number, f"parent: unknown category {row.parent!r}")
+			continue
+
+		operations.append(UpdateOne({"name": row.name}, {"$set": {"parent": refs[row.parent]}}))
+		row_numbers.append(row_number)
+
+	parent_report = ImportReport(max_errors=report.max_errors)
+
+	await bulk_upsert(collection, operations, row_numbers, parent_report)
+
+	report.modified += parent_report.modified
+
+	for error in parent_report.errors:
+		report.add_error(error["row"], error["error"])
+
+async def write_products(batch: list[tuple[int, dict[str, Any]]], report: ImportReport) -> None:
+	rows: list[tuple[int, ProductImportRow]] = []
+
+	for row_number, row in batch:
+		try:
+			rows.append((row_number, ProductImportRow.model_validate(row)))
+		except ValidationError as e:
+			report.add_error(row_number, row_error(e))
+
+	# one category lookup per batch instead of one per row
+	refs = await category_refs({row.category for _, row in rows})
+	paths = await ProductCategory.paths_by_id()
+	defaults = product_defaults()
+
+	operations = []
+	row_numbers = []
+
+	for row_number, row in rows:
+		if row.category not in refs:
+			report.add_error(row_number, f"category: unknown category {row.category!r}")
+			continue
+
+		values = {name: to_bson(value) for name, value in row.model_dump(exclude={"id"}, exclude_unset=True, exclude_none=True).items()}
+		values["category"] = refs[row.category]
+		values["category_path"] = paths.get(refs[row.category].id, [refs[row.category].id])
+
+		query = {"_id": row.id} if row.id is not None else {"name": row.name, "brand": row.brand}
+
+		operations.append(UpdateOne(query, {
+			"$set": values,
+			"$setOnInsert": {name: value for name, value in defaults.items() if name not in values and name not in query},
+		}, upsert=True))
+		row_numbers.append(row_number)
+
+	await bulk_upsert(Product.get_pymongo_collection(), operations, row_numbers, report)
+
+async def import_catalog(
+	kind: CatalogImportKind,
+	rows: Iterator[tuple[int, dict[str, Any] | str]],
+	batch_size: int,
+	max_errors: int = 1_000,
+) -> ImportReport:
+	write_batch: Callable[[list[tuple[int, dict[str, Any]]], ImportReport], Awaitable[None]] = write_categories if kind is CatalogImportKind.CATEGORIES else write_products
+
+	report = ImportReport(max_errors=max_errors)
+
+	while True:
+		# rows come from a blocking file reader, keep it off the event loop
+		batch = await asyncio.to_thread(list, itertools.islice(rows, batch_size))
+
+		if not batch:
+			break
+
+		report.rows += len(batch)
+
+		parsed = []
+
+		for row_number, row in batch:
+			if isinstance(row, str):
+				report.add_error(row_number, row)
+			else:
+				parsed.append((row_number, row))
+
+		await write_batch(parsed, report)
+
+	# bulk writes bypass the document event hooks, so refresh the tree, caches and stats they maintain
+	if kind is CatalogImportKind.CATEGORIES:
+		await ProductCategory.rebuild_tree()
+
+	CATEGORY_IDS_CACHE.clear()
+	await CATALOG_CACHE.clear()
+
+	if kind is CatalogImportKind.PRODUCTS:
+		await ShopStats.reconcile()
+
+	return report.finish()
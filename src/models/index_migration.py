@@ -0,0 +1,154 @@
+import datetime
+import hashlib
+import logging
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+import orjson
+import pymongo
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+# options that change what an index does, anything else (build options, version) is ignored when comparing
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression", "collation", "weights", "default_language")
+
+
+def index_spec(document: dict[str, Any]) -> dict[str, Any]:
+	# declarations hold a SON of keys, index_information a list of pairs
+	keys = [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in (document["key"].items() if isinstance(document["key"], Mapping) else document["key"])]
+
+	spec = {option: document[option] for option in COMPARED_OPTIONS if option in document}
+
+	# text indexes are reported with internal _fts keys, so they are only compared by their options
+	if any(direction == pymongo.TEXT or field == "_fts" for field, direction in keys):
+		# the server reports the defaults it filled in, so a declaration has to spell them out to compare equal
+		weights = {field: 1 for field, direction in keys if direction == pymongo.TEXT and field != "_fts"}
+		weights.update(spec.get("weights", {}))
+
+		spec["weights"] = {field: int(weight) for field, weight in weights.items()}
+		spec.setdefault("default_language", "english")
+
+		keys = "text"
+
+	return {"key": keys, **spec}
+
+
+class IndexPlan():
+	def __init__(self, model: type[Document], version: str, recorded_version: str | None) -> None:
+		self.model = model
+		self.version = version
+		self.recorded_version = recorded_version
+
+		self.create: list[IndexModel] = []
+		self.conflicting: list[IndexModel] = []
+		self.stale: list[str] = []
+
+	@property
+	def collection(self) -> str:
+		return self.model.get_collection_name()
+
+	@property
+	def pending(self) -> bool:
+		return bool(self.create or self.conflicting or self.recorded_version != self.version)
+
+	def describe(self, drop: bool = False) -> list[str]:
+		needs_drop = "" if drop else " (needs --drop)"
+
+		lines = [f"create {index.document['name']}" for index in self.create]
+		lines += [f"rebuild {index.document['name']}{needs_drop}" for index in self.conflicting]
+		lines += [f"drop {name}{needs_drop}" for name in self.stale]
+
+		if not lines and self.recorded_version != self.version:
+			lines.append(f"record version {self.version}")
+
+		return lines
+
+
+class IndexMigration(Document):
+	id: str
+	version: str
+	indexes: list[str] = Field(default_factory=list)
+	applied_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(tz=datetime.UTC))
+
+	class Settings:
+		name = "index_migrations"
+
+	@staticmethod
+	def declared_indexes(model: type[Document]) -> list[IndexModel]:
+		return list(getattr(model.Settings, "indexes", None) or [])
+
+	@classmethod
+	def version_of(cls, model: type[Document]) -> str:
+		# the version is derived from the declarations, so changing an index in Settings is all a migration needs
+		specs = sorted(orjson.dumps({"name": index.document["name"], **index_spec(index.document)}, option=orjson.OPT_SORT_KEYS) for index in cls.declared_indexes(model))
+
+		return hashlib.blake2b(b"\n".join(specs), digest_size=8).hexdigest()
+
+	@classmethod
+	async def recorded_versions(cls, models: Sequence[type[Document]]) -> dict[str, str]:
+		records = await cls.find({"_id": {"$in": [model.get_collection_name() for model in models]}}).to_list()
+
+		return {record.id: record.version for record in records}
+
+	@classmethod
+	async def verify(cls, models: Sequence[type[Document]]) -> list[type[Document]]:
+		# a single read against the recorded versions, startup never lists or builds indexes itself
+		recorded = await cls.recorded_versions(models)
+
+		return [model for model in models if recorded.get(model.get_collection_name()) != cls.version_of(model)]
+
+	@classmethod
+	async def plan(cls, models: Sequence[type[Document]]) -> list[IndexPlan]:
+		recorded = await cls.recorded_versions(models)
+		plans = []
+
+		for model in models:
+			plan = IndexPlan(model, cls.version_of(model), recorded.get(model.get_collection_name()))
+			existing = await model.get_pymongo_collection().index_information()
+
+			for index in cls.declared_indexes(model):
+				name = index.document["name"]
+
+				if name not in existing:
+					plan.create.append(index)
+				elif index_spec(existing[name]) != index_spec(index.document):
+					plan.conflicting.append(index)
+
+			declared = {index.document["name"] for index in cls.declared_indexes(model)}
+			plan.stale = [name for name in existing if name != "_id_" and name not in declared]
+
+			plans.append(plan)
+
+		return plans
+
+	@classmethod
+	async def apply(cls, models: Sequence[type[Document]], drop: bool = False) -> list[IndexPlan]:
+		plans = await cls.plan(models)
+
+		for plan in plans:
+			if not plan.pending and not (drop and plan.stale):
+				continue
+
+			collection = plan.model.get_pymongo_collection()
+
+			if drop:
+				for name in plan.stale + [index.document["name"] for index in plan.conflicting]:
+					logging.warning(f"Dropping index {plan.collection}.{name}")
+					await collection.drop_index(name)
+
+				plan.create += plan.conflicting
+				plan.conflicting = []
+
+			if plan.create:
+				# since MongoDB 4.2 index builds only lock the collection briefly at start and end, reads and writes keep going meanwhile
+				logging.info(f"Building indexes {', '.join(index.document['name'] for index in plan.create)} on {plan.collection}")
+				await collection.create_indexes(plan.create)
+
+			if plan.conflicting:
+				logging.error(f"Indexes {', '.join(index.document['name'] for index in plan.conflicting)} on {plan.collection} differ from their declaration, rerun with --drop to rebuild them")
+				continue
+
+			await cls(id=plan.collection, version=plan.version, indexes=[index.document["name"] for index in cls.declared_indexes(plan.model)]).save()
+
+		return plans
@@ -0,0 +1,41 @@
+import datetime
+import os
+import socket
+
+from beanie import Document
+from pymongo.errors import DuplicateKeyError
+
+# identifies this process among the workers and hosts sharing the database
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLease(Document):
+	id: str
+	owner: str
+	expires_at: datetime.datetime
+
+	class Settings:
+		name = "job_leases"
+
+	@classmethod
+	async def acquire(cls, name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+		# one worker runs a singleton job, the lease moves on once its holder stops renewing it
+		now = datetime.datetime.now(tz=datetime.UTC)
+
+		try:
+			await cls.get_pymongo_collection().update_one({
+				"_id": name,
+				"$or": [{"owner": owner}, {"expires_at": {"$lt": now}}],
+			}, {
+				"$set": {"owner": owner, "expires_at": now + datetime.timedelta(seconds=ttl)},
+			}, upsert=True)
+		except DuplicateKeyError:
+			# the lease exists and is held by another live worker
+			return False
+
+		return True
+
+	@classmethod
+	async def release(cls, name: str, owner: str = WORKER_ID) -> None:
+		# only the holder may hand the lease back, a lease taken over after expiry stays with its new owner
+		await cls.get_pymongo_collection().delete_one({"_id": name, "owner": owner})
@@ -1,12 +1,20 @@
 import datetime
 import enum
+from decimal import Decimal
 
-from beanie import DecimalAnnotation, Document, Link
+from beanie import DecimalAnnotation, Document, Insert, Link, PydanticObjectId, after_event
+from beanie.operators import In
+from bson import DBRef
 from pydantic import BaseModel, Field, NonNegativeInt
+import pymongo
+from pymongo import IndexModel, UpdateOne
+from pymongo.asynchronous.client_session import AsyncClientSession
 
 from models.product import Product
 
-from .user import User
+from .catalog_cache import CATALOG_CACHE, product_key
+from .shop_stats import ShopStats
+from .user import CartProduct, User, UserCart
 
 
 class OrderStatus(enum.Enum):
@@ -16,9 +24,18 @@ class OrderStatus(enum.Enum):
 	CANCELLED = "cancelled"
 
 
+class InsufficientStockError(Exception):
+	def __init__(self, products: list[str]) -> None:
+		super().__init__(f"Not enough stock for: {', '.join(products)}")
+
+		self.products = products
+
+
 class OrderItem(BaseModel):
 	product: Link[Product]
 	quantity: NonNegativeInt
+	size: str | None = None
+	price: DecimalAnnotation | None = None
 
 
 class Order(Document):
@@ -27,7 +44,121 @@ class Order(Document):
 	status: OrderStatus = OrderStatus.PENDING
 	total_price: DecimalAnnotation | None = None
 	created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(tz=datetime.UTC))
+	# whether the recommendations job has counted this order's product pairs
+	co_purchases_counted: bool = False
 
 	class Settings:
 		name = "orders"
 		use_state_management = True
+		indexes = [
+			IndexModel([("user", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING)]),
+			IndexModel([("created_at", pymongo.ASCENDING)]),
+			# only the cancelled orders whose pairs still have to be taken back out
+			IndexModel([("status", pymongo.ASCENDING)], partialFilterExpression={"status": OrderStatus.CANCELLED.value, "co_purchases_counted": True}, name="status_cancelled_counted"),
+		]
+
+	@after_event(Insert)
+	async def record_stats(self) -> None:
+		await ShopStats.record_order(self.status.value, self.total_price)
+
+	@classmethod
+	async def checkout(cls, user: User) -> "Order":
+		client = cls.get_pymongo_collection().database.client
+
+		async def place_order(session: AsyncClientSession) -> Order | None:
+			# read the cart inside the transaction so a concurrent cart edit conflicts instead of being lost
+			user_document = await User.get_pymongo_collection().find_one({"_id": user.id}, {"cart": 1}, session=session)
+
+			cart = [UserCart.model_validate(item) for item in (user_document or {}).get("cart", []) if item["quantity"] > 0]
+
+			if not cart:
+				raise ValueError("Cart is empty")
+
+			quantities: dict[PydanticObjectId, int] = {}
+
+			for item in cart:
+				quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+			products = {product.id: product for product in await Product.find(In(Product.id, list(quantities)), projection_model=CartProduct, session=session).to_list()}
+
+			missing = [product_id for product_id in quantities if product_id not in products]
+
+			if missing:
+				# products deleted since they were added are dropped from the cart, the rest is still ordered
+				await User.get_pymongo_collection().update_one({"_id": user.id}, {"$pull": {"cart": {"product_id": {"$in": missing}}}}, session=session)
+
+				cart = [item for item in cart if item.product_id in products]
+
+				for product_id in missing:
+					del quantities[product_id]
+
+				if not cart:
+					# returning instead of raising commits the removal
+					return None
+
+			# every line only decrements if it still has enough stock, a short line aborts the whole transaction
+			update_result = await Product.get_pymongo_collection().bulk_write([
+				UpdateOne({"_id": product_id, "stock": {"$gte": quantity}}, {"$inc": {"stock": -quantity}}) for product_id, quantity in quantities.items()
+			], ordered=False, session=session)
+
+			if update_result.modified_count != len(quantities):
+				raise InsufficientStockError([products[product_id].name for product_id, quantity in quantities.items() if products[product_id].stock < quantity])
+
+			order = cls(
+				user=user,
+				items=[OrderItem(
+					product=DBRef(Product.get_collection_name(), item.product_id),
+					quantity=item.quantity,
+					size=item.size,
+					price=products[item.product_id].price,
+				) for item in cart],
+				total_price=sum((products[item.product_id].price * item.quantity for item in cart), Decimal(0)),
+			)
+
+			await order.insert(session=session, skip_actions=["record_stats"])
+
+			await User.get_pymongo_collection().update_one({"_id": user.id}, {"$set": {"cart": []}}, session=session)
+
+			return order
+
+		async with client.start_session() as session:
+			# with_transaction retries the whole callback on write conflicts between concurrent buyers
+			order = await session.with_transaction(place_order)
+
+		user.invalidate_cache()
+
+		if order is None:
+			raise ValueError("Cart is empty, its products are no longer available")
+
+		user.cart = []
+
+		await CATALOG_CACHE.invalidate(*(product_key(item.product.ref.id) for item in order.items))
+
+		# the shared stats document stays out of the transaction, otherwise every checkout would conflict on it
+		await ShopStats.record_order(order.status.value, order.total_price)
+		await ShopStats.record_stock(-sum(item.quantity for item in order.items))
+
+		return order
+
+	async def change_status(self, status: OrderStatus) -> bool:
+		previous_status = self.status
+
+		if previous_status == status:
+			return False
+
+		# only the request that actually flips the status may count the transition
+		update_result = await self.get_pymongo_collection().update_one({
+			"_id": self.id,
+			"status": previous_status.value,
+		}, {
+			"$set": {"status": status.value},
+		})
+
+		if update_result.modified_count == 0:
+			return False
+
+		self.status = status
+
+		await ShopStats.record_status_change(previous_status.value, status.value, self.total_price)
+
+		return True
@@ -1,16 +1,22 @@
 import datetime
 import enum
-from typing import TYPE_CHECKING
+from decimal import Decimal
+from typing import Any, ClassVar
 
 import pymongo
-from beanie import BackLink, DecimalAnnotation, Document, Link
-from pydantic import Field, NonNegativeInt
+from beanie import DecimalAnnotation, Delete, Document, Insert, Link, PydanticObjectId, Replace, Save, SaveChanges, Update, after_event, before_event
+from bson import DBRef
+from bson.errors import InvalidId
+from pydantic import BaseModel, Field, NonNegativeInt, computed_field
 from pymongo import IndexModel
+from pymongo.asynchronous.client_session import AsyncClientSession
 
-from .product_category import ProductCategory
+from utils import DocumentView, decode_cursor, encode_cursor, keyset_filter, view_value
 
-if TYPE_CHECKING:
-	from models.review import Review
+from .catalog_cache import BRANDS_KEY, CATALOG_CACHE, FACETS_KEY, product_key
+from .product_category import ProductCategory
+from .read_routing import ReadRouted
+from .shop_stats import ShopStats
 
 
 class ProductGender(enum.Enum):
@@ -19,10 +25,44 @@ class ProductGender(enum.Enum):
 	UNISEX = "unisex"
 
 
-class Product(Document):
+class ProductSort(enum.Enum):
+	NEWEST = "newest"
+	OLDEST = "oldest"
+	PRICE_ASC = "price_asc"
+	PRICE_DESC = "price_desc"
+
+	@property
+	def field(self) -> str:
+		if self in (ProductSort.PRICE_ASC, ProductSort.PRICE_DESC):
+			return "price"
+
+		return "created_at"
+
+	@property
+	def direction(self) -> int:
+		if self in (ProductSort.OLDEST, ProductSort.PRICE_ASC):
+			return pymongo.ASCENDING
+
+		return pymongo.DESCENDING
+
+
+class RatingSummary(BaseModel):
+	count: NonNegativeInt = 0
+	total: NonNegativeInt = 0
+	histogram: dict[str, NonNegativeInt] = Field(default_factory=lambda: {str(rating): 0 for rating in range(1, 6)})
+
+	@computed_field
+	@property
+	def average(self) -> float:
+		return round(self.total / self.count, 2) if self.count else 0.0
+
+
+class Product(ReadRouted, Document):
 	name: str
 	description: str | None = None
 	category: Link[ProductCategory]
+	# the category and its ancestors, so a parent category matches its whole subtree
+	category_path: list[PydanticObjectId] = Field(default_factory=list)
 	brand: str | None = None
 	gender: ProductGender = ProductGender.UNISEX
 	sizes: list[str] = Field(default_factory=list)
@@ -30,12 +70,215 @@ class Product(Document):
 	price: DecimalAnnotation
 	image_url: str = "https://media.istockphoto.com/id/1396160859/photo/baby-and-child-clothes-toys-in-box-second-hand-apparel-idea-circular-fashion-donation-charity.webp?b=1&s=612x612&w=0&k=20&c=uSweFaKbnO2xPEiPLj-lcoUKttjJfVfKMNPOhaueWEE="
 	created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(tz=datetime.UTC))
-	reviews: list[BackLink["Review"]] = Field(json_schema_extra={"original_field": "product"})
+	rating: RatingSummary = Field(default_factory=RatingSummary)
 
 	class Settings:
 		name = "products"
 		use_state_management = True
 		indexes = [
-			IndexModel([("category", pymongo.ASCENDING), ("price", pymongo.ASCENDING)]),
-			IndexModel([("category", pymongo.ASCENDING), ("gender", pymongo.ASCENDING), ("price", pymongo.ASCENDING)]),
+			IndexModel([("category", pymongo.ASCENDING)]),
+			IndexModel([("category_path", pymongo.ASCENDING), ("price", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+			IndexModel([("category_path", pymongo.ASCENDING), ("gender", pymongo.ASCENDING), ("price", pymongo.ASCENDING)]),
+			IndexModel([("category_path", pymongo.ASCENDING), ("created_at", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+			IndexModel([("price", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+			IndexModel([("created_at", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+			IndexModel([("name", pymongo.ASCENDING), ("brand", pymongo.ASCENDING)]),
+			IndexModel([("brand", pymongo.ASCENDING)]),
+			IndexModel([("name", pymongo.TEXT), ("brand", pymongo.TEXT), ("description", pymongo.TEXT)], weights={"name": 10, "brand": 5, "description": 1}, name="product_text"),
 		]
+
+	PROJECTABLE_FIELDS: ClassVar[frozenset[str]] = frozenset(("name", "description", "category", "category_path", "brand", "gender", "sizes", "stock", "price", "image_url", "created_at", "rating"))
+
+	SEARCH_FIELDS: ClassVar[frozenset[str]] = frozenset(("name", "category", "brand", "gender", "price", "image_url", "rating", "created_at"))
+
+	PRICE_BUCKETS: ClassVar[list[int]] = [0, 25, 50, 100, 200, 500]
+
+	FACETS: ClassVar[dict[str, list[dict[str, Any]]]] = {
+		"categories": [
+			{"$group": {"_id": "$category", "count": {"$sum": 1}}},
+			{"$sort": {"count": pymongo.DESCENDING}},
+		],
+		"brands": [
+			{"$match": {"brand": {"$ne": None}}},
+			{"$group": {"_id": "$brand", "count": {"$sum": 1}}},
+			{"$sort": {"count": pymongo.DESCENDING, "_id": pymongo.ASCENDING}},
+			{"$limit": 50},
+		],
+		"genders": [
+			{"$group": {"_id": "$gender", "count": {"$sum": 1}}},
+			{"$sort": {"count": pymongo.DESCENDING}},
+		],
+		"prices": [
+			{"$bucket": {"groupBy": "$price", "boundaries": PRICE_BUCKETS, "default": "other", "output": {"count": {"$sum": 1}}}},
+		],
+		"total": [
+			{"$count": "count"},
+		],
+	}
+
+	@classmethod
+	async def views(cls, documents: list[dict[str, Any]]) -> list[DocumentView]:
+		# one pass over the raw documents instead of validating Documents and serializing them again
+		categories = await ProductCategory.views_by_id()
+
+		views = []
+
+		for document in documents:
+			view = DocumentView()
+
+			for key, value in document.items():
+				if key == "category" and isinstance(value, DBRef):
+					view[key] = categories.get(value.id) or DocumentView(id=str(value.id), collection=value.collection)
+				elif key == "rating":
+					count = value.get("count", 0)
+					view[key] = {**value, "average": round(value.get("total", 0) / count, 2) if count else 0.0}
+				else:
+					view[key] = view_value(value)
+
+			views.append(view)
+
+		return views
+
+	@staticmethod
+	def in_categories(category_ids: list[PydanticObjectId]) -> dict[str, Any]:
+		# category_path holds every ancestor, so one indexed $in covers the categories and all their subcategories
+		return {"category_path": {"$in": list(category_ids)}}
+
+	@classmethod
+	async def find_page(
+		cls,
+		*filters: Any,
+		sort: ProductSort,
+		limit: int,
+		cursor: str | None = None,
+		fields: frozenset[str] | None = None,
+	) -> tuple[list[DocumentView], str | None]:
+		query = cls.find(*filters)
+
+		if cursor is not None:
+			payload = decode_cursor(cursor)
+
+			if payload.get("sort") != sort.value:
+				raise ValueError("Cursor does not match sort order")
+
+			try:
+				value = Decimal(payload["value"]) if sort.field == "price" else datetime.datetime.fromisoformat(payload["value"])
+				last_id = PydanticObjectId(payload["id"])
+			except (KeyError, TypeError, ArithmeticError, ValueError, InvalidId) as e:
+				raise ValueError("Invalid cursor") from e
+
+			query = query.find(keyset_filter(sort.field, sort.direction, value, last_id))
+
+		projection = {field: 1 for field in fields | {sort.field}} if fields else None
+
+		documents = await cls.get_pymongo_collection().find(query.get_filter_query(), projection).sort([(sort.field, sort.direction), ("_id", sort.direction)]).limit(limit + 1).to_list()
+
+		next_cursor = None
+
+		if len(documents) > limit:
+			documents = documents[:limit]
+
+			last_value = documents[-1][sort.field]
+
+			next_cursor = encode_cursor({
+				"sort": sort.value,
+				"value": view_value(last_value) if sort.field == "price" else last_value.isoformat(),
+				"id": str(documents[-1]["_id"]),
+			})
+
+		return await cls.views(documents), next_cursor
+
+	@classmethod
+	async def search(cls, *filters: Any, text: str | None, limit: int) -> tuple[list[DocumentView], dict[str, Any]]:
+		projection: dict[str, Any] = {field: 1 for field in cls.SEARCH_FIELDS}
+
+		if text:
+			filters = (*filters, {"$text": {"$search": text}})
+
+			sort: dict[str, Any] = {"score": {"$meta": "textScore"}, "_id": pymongo.ASCENDING}
+		else:
+			sort = {"created_at": pymongo.DESCENDING, "_id": pymongo.DESCENDING}
+
+		# results and every facet come back from the same $facet round trip
+		[facets] = await cls.find(*filters).aggregate([{"$facet": {
+			"results": [{"$sort": sort}, {"$limit": limit}, {"$project": projection}],
+			**cls.FACETS,
+		}}]).to_list()
+
+		return await cls.views(facets.pop("results")), await cls.format_facets(facets)
+
+	@classmethod
+	async def catalog_facets(cls) -> dict[str, Any]:
+		async def load() -> dict[str, Any]:
+			[facets] = await cls.aggregate([{"$facet": cls.FACETS}]).to_list()
+
+			return await cls.format_facets(facets)
+
+		return await CATALOG_CACHE.get_or_load(FACETS_KEY, load)
+
+	@classmethod
+	async def format_facets(cls, facets: dict[str, Any]) -> dict[str, Any]:
+		category_names = await ProductCategory.names_by_id()
+
+		prices = []
+
+		for bucket in facets["prices"]:
+			if bucket["_id"] == "other":
+				prices.append({"min": cls.PRICE_BUCKETS[-1], "max": None, "count": bucket["count"]})
+			else:
+				prices.append({"min": bucket["_id"], "max": cls.PRICE_BUCKETS[cls.PRICE_BUCKETS.index(bucket["_id"]) + 1], "count": bucket["count"]})
+
+		return {
+			"total": facets["total"][0]["count"] if facets["total"] else 0,
+			"categories": [{
+				"id": str(category["_id"].id),
+				"name": category_names.get(category["_id"].id),
+				"count": category["count"],
+			} for category in facets["categories"] if category["_id"] is not None],
+			"brands": [{"value": brand["_id"], "count": brand["count"]} for brand in facets["brands"]],
+			"genders": [{"value": gender["_id"], "count": gender["count"]} for gender in facets["genders"]],
+			"prices": prices,
+		}
+
+	@classmethod
+	async def adjust_stock(cls, product_id: PydanticObjectId, delta: int) -> bool:
+		query: dict[str, Any] = {"_id": product_id}
+
+		if delta < 0:
+			query["stock"] = {"$gte": -delta}
+
+		update_result = await cls.get_pymongo_collection().update_one(query, {"$inc": {"stock": delta}})
+
+		if update_result.modified_count == 0:
+			return False
+
+		await CATALOG_CACHE.invalidate(product_key(product_id))
+		await ShopStats.record_stock(delta)
+
+		return True
+
+	@classmethod
+	async def record_rating(cls, product_id: PydanticObjectId, rating: int, session: AsyncClientSession | None = None) -> None:
+		await cls.get_pymongo_collection().update_one({"_id": product_id}, {"$inc": {
+			"rating.count": 1,
+			"rating.total": rating,
+			f"rating.histogram.{rating}": 1,
+		}}, session=session)
+
+	@before_event(Insert, Replace, Save, SaveChanges)
+	async def set_category_path(self) -> None:
+		category_id = self.category.ref.id if isinstance(self.category, Link) else self.category.id
+
+		self.category_path = list((await ProductCategory.paths_by_id()).get(category_id, [category_id]))
+
+	@after_event(Insert)
+	async def record_stock_added(self) -> None:
+		await ShopStats.record_stock(self.stock)
+
+	@after_event(Delete)
+	async def record_stock_removed(self) -> None:
+		await ShopStats.record_stock(-self.stock)
+
+	@after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+	async def invalidate_cache(self) -> None:
+		await CATALOG_CACHE.invalidate(product_key(self.id), BRANDS_KEY, FACETS_KEY)
@@ -1,10 +1,187 @@
-from beanie import Document, Link
+from collections.abc import Iterable
+from typing import Any
 
+import pymongo
+from beanie import Delete, Document, Insert, Link, PydanticObjectId, Replace, Save, SaveChanges, Update, after_event, before_event
+from bson import DBRef
+from pydantic import Field
+from pymongo import IndexModel, UpdateMany, UpdateOne
 
-class ProductCategory(Document):
+import config
+from utils import DocumentView, TTLCache
+
+from .catalog_cache import CATALOG_CACHE
+from .read_routing import ReadRouted, primary_reads
+
+# filled from the primary like the catalog cache, so a category write is not undone by a lagging secondary
+CATEGORY_IDS_CACHE = TTLCache(maxsize=3, ttl=config.CATEGORY_CACHE_TTL)
+
+
+def tree_ancestors(parents: dict[Any, Any]) -> dict[Any, list[Any]]:
+	# root first ancestor ids of every category, a category caught in a parent cycle is treated as a root
+	ancestors = {}
+
+	for category_id in parents:
+		path = []
+		parent_id = parents[category_id]
+
+		while parent_id is not None and parent_id in parents and parent_id != category_id and parent_id not in path:
+			path.append(parent_id)
+			parent_id = parents[parent_id]
+
+		ancestors[category_id] = [] if parent_id is not None and parent_id in parents else path[::-1]
+
+	return ancestors
+
+
+class ProductCategory(ReadRouted, Document):
 	name: str
 	parent: Link["ProductCategory"] | None = None
+	# materialized path, root first, kept in sync with parent by rebuild_tree
+	ancestors: list[PydanticObjectId] = Field(default_factory=list)
 
 	class Settings:
 		name = "product_categories"
 		use_state_management = True
+		indexes = [
+			IndexModel([("name", pymongo.ASCENDING)]),
+			IndexModel([("ancestors", pymongo.ASCENDING)]),
+		]
+
+	@classmethod
+	async def category_maps(cls) -> tuple[dict[str, list[PydanticObjectId]], dict[PydanticObjectId, str]]:
+		maps = CATEGORY_IDS_CACHE.get("maps")
+
+		if maps is None:
+			ids_by_name = {}
+			names_by_id = {}
+
+			with primary_reads():
+				categories = await cls.find_all().to_list()
+
+			for category in categories:
+				ids_by_name.setdefault(category.name, []).append(category.id)
+				names_by_id[category.id] = category.name
+
+			maps = (ids_by_name, names_by_id)
+
+			CATEGORY_IDS_CACHE.set("maps", maps)
+
+		return maps
+
+	@classmethod
+	async def ids_by_name(cls, names: Iterable[str]) -> list[PydanticObjectId]:
+		ids_by_name, _ = await cls.category_maps()
+
+		return [category_id for name in names for category_id in ids_by_name.get(name, [])]
+
+	@classmethod
+	async def names_by_id(cls) -> dict[PydanticObjectId, str]:
+		_, names_by_id = await cls.category_maps()
+
+		return names_by_id
+
+	@classmethod
+	async def paths_by_id(cls) -> dict[PydanticObjectId, list[PydanticObjectId]]:
+		paths = CATEGORY_IDS_CACHE.get("paths")
+
+		if paths is None:
+			# the category_path products store, the ancestors followed by the category itself
+			with primary_reads():
+				categories = await cls.get_pymongo_collection().find({}, {"ancestors": 1}).to_list()
+
+			paths = {category["_id"]: [*category.get("ancestors", []), category["_id"]] for category in categories}
+
+			CATEGORY_IDS_CACHE.set("paths", paths)
+
+		return paths
+
+	@classmethod
+	async def views_by_id(cls) -> dict[PydanticObjectId, DocumentView]:
+		views = CATEGORY_IDS_CACHE.get("views")
+
+		if views is None:
+			# shaped like a serialized category so listings embed the same object as full documents
+			views = {}
+
+			with primary_reads():
+				categories = await cls.get_pymongo_collection().find({}, {"name": 1, "parent": 1, "ancestors": 1}).to_list()
+
+			for category in categories:
+				parent = category.get("parent")
+
+				views[category["_id"]] = DocumentView(
+					id=str(category["_id"]),
+					name=category["name"],
+					parent={"id": str(parent.id), "collection": parent.collection} if parent else None,
+					ancestors=[str(ancestor) for ancestor in category.get("ancestors", [])],
+				)
+
+			CATEGORY_IDS_CACHE.set("views", views)
+
+		return views
+
+	@classmethod
+	async def tree(cls) -> list[dict[str, Any]]:
+		categories = await cls.get_pymongo_collection().find({}, {"name": 1, "parent": 1}).sort("name", pymongo.ASCENDING).to_list()
+
+		ancestors = tree_ancestors({category["_id"]: category["parent"].id if category.get("parent") else None for category in categories})
+		nodes = {category["_id"]: {"id": str(category["_id"]), "name": category["name"], "children": []} for category in categories}
+
+		roots = []
+
+		for category in categories:
+			path = ancestors[category["_id"]]
+
+			if path:
+				nodes[path[-1]]["children"].append(nodes[category["_id"]])
+			else:
+				roots.append(nodes[category["_id"]])
+
+		return roots
+
+	@classmethod
+	async def rebuild_tree(cls) -> tuple[int, int]:
+		# imported here since the product module imports this one
+		from .product import Product
+
+		parents = {category["_id"]: category["parent"].id if category.get("parent") else None for category in await cls.get_pymongo_collection().find({}, {"parent": 1}).to_list()}
+
+		if not parents:
+			return 0, 0
+
+		category_updates = []
+		product_updates = []
+
+		# the $ne guards only touch documents whose path actually changed
+		for category_id, ancestors in tree_ancestors(parents).items():
+			category_updates.append(UpdateOne({"_id": category_id, "ancestors": {"$ne": ancestors}}, {"$set": {"ancestors": ancestors}}))
+
+			path = [*ancestors, category_id]
+			product_updates.append(UpdateMany({"category": DBRef(cls.get_collection_name(), category_id), "category_path": {"$ne": path}}, {"$set": {"category_path": path}}))
+
+		category_result = await cls.get_pymongo_collection().bulk_write(category_updates, ordered=False)
+		product_result = await Product.get_pymongo_collection().bulk_write(product_updates, ordered=False)
+
+		return category_result.modified_count, product_result.modified_count
+
+	@before_event(Insert, Replace, Save, SaveChanges)
+	async def set_ancestors(self) -> None:
+		parent_id = None
+
+		if isinstance(self.parent, Link):
+			parent_id = self.parent.ref.id
+		elif self.parent is not None:
+			parent_id = self.parent.id
+
+		self.ancestors = list((await self.paths_by_id()).get(parent_id, [])) if parent_id is not None else []
+
+	@after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+	async def invalidate_cache(self) -> None:
+		# a moved or deleted category changes the paths of its whole subtree and their products
+		await self.rebuild_tree()
+
+		CATEGORY_IDS_CACHE.clear()
+
+		# cached products embed their category, so drop the whole catalog
+		await CATALOG_CACHE.clear()
@@ -0,0 +1,67 @@
+import contextlib
+import contextvars
+from collections.abc import Iterator
+
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred, _ServerMode
+
+import config
+
+READ_PREFERENCES: dict[str, type[_ServerMode]] = {
+	"primary": Primary,
+	"primaryPreferred": PrimaryPreferred,
+	"secondary": Secondary,
+	"secondaryPreferred": SecondaryPreferred,
+	"nearest": Nearest,
+}
+
+# read preference of the reads made in this context, None keeps the client default
+READ_PREFERENCE: contextvars.ContextVar[_ServerMode | None] = contextvars.ContextVar("read_preference", default=None)
+
+
+def read_preference_from_name(name: str, max_staleness: int = -1) -> _ServerMode:
+	if name not in READ_PREFERENCES:
+		raise ValueError(f"Unknown read preference {name}, expected one of {', '.join(READ_PREFERENCES)}")
+
+	if name == "primary":
+		return Primary()
+
+	return READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+CATALOG_READ_PREFERENCE = read_preference_from_name(config.CATALOG_READ_PREFERENCE, config.CATALOG_MAX_STALENESS)
+
+
+@contextlib.contextmanager
+def catalog_reads() -> Iterator[None]:
+	# only reads that can tolerate a few seconds of staleness opt in, everything else stays on the primary
+	token = READ_PREFERENCE.set(CATALOG_READ_PREFERENCE)
+
+	try:
+		yield
+	finally:
+		READ_PREFERENCE.reset(token)
+
+
+@contextlib.contextmanager
+def primary_reads() -> Iterator[None]:
+	# cache fills read from the primary, a write drops the entry and a lagging secondary would refill it with the old document
+	token = READ_PREFERENCE.set(Primary())
+
+	try:
+		yield
+	finally:
+		READ_PREFERENCE.reset(token)
+
+
+class ReadRouted():
+	# mixed into documents whose reads may be routed, beanie runs every query through get_pymongo_collection
+	@classmethod
+	def get_pymongo_collection(cls) -> AsyncCollection:
+		collection = super().get_pymongo_collection()
+		read_preference = READ_PREFERENCE.get()
+
+		if read_preference is None or read_preference == collection.read_preference:
+			return collection
+
+		return collection.with_options(read_preference=read_preference)
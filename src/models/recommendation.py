@@ -0,0 +1,193 @@
+import collections
+import datetime
+import itertools
+from typing import Any
+
+import pymongo
+from beanie import Document, PydanticObjectId
+from bson import DBRef
+from pydantic import BaseModel, Field, NonNegativeInt
+from pymongo import IndexModel, UpdateOne
+from pymongo.asynchronous.client_session import AsyncClientSession
+
+from utils import DocumentView
+
+from .order import Order, OrderStatus
+from .product import Product
+from .read_routing import ReadRouted
+
+
+class RecommendedProduct(BaseModel):
+	product_id: PydanticObjectId
+	count: NonNegativeInt
+
+
+class CoPurchase(Document):
+	# how many counted orders contained both products, stored once per direction
+	product: PydanticObjectId
+	other: PydanticObjectId
+	orders: int = 0
+
+	class Settings:
+		name = "co_purchases"
+		indexes = [
+			IndexModel([("product", pymongo.ASCENDING), ("other", pymongo.ASCENDING)], unique=True),
+			IndexModel([("product", pymongo.ASCENDING), ("orders", pymongo.DESCENDING)]),
+		]
+
+
+class RecommendationRun(Document):
+	since: datetime.datetime | None = None
+	until: datetime.datetime
+	orders: NonNegativeInt = 0
+	cancelled_orders: NonNegativeInt = 0
+	products: NonNegativeInt = 0
+	started_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(tz=datetime.UTC))
+	# stays None for a run that crashed, the next run starts from the last finished one
+	finished_at: datetime.datetime | None = None
+
+	class Settings:
+		name = "recommendation_runs"
+
+
+class ProductRecommendations(ReadRouted, Document):
+	# the _id is the product, top its most co-purchased products
+	id: PydanticObjectId
+	top: list[RecommendedProduct] = Field(default_factory=list)
+	updated_at: datetime.datetime | None = None
+
+	class Settings:
+		name = "product_recommendations"
+
+	@classmethod
+	async def for_product(cls, product_id: PydanticObjectId, limit: int, fields: frozenset[str]) -> list[DocumentView]:
+		# one _id lookup, the recommended products are joined on their _id in the same round trip
+		documents = await cls.aggregate([
+			{"$match": {"_id": product_id}},
+			{"$project": {"top": 1}},
+			{"$lookup": {
+				"from": Product.get_collection_name(),
+				"localField": "top.product_id",
+				"foreignField": "_id",
+				"pipeline": [{"$match": {"stock": {"$gt": 0}}}, {"$project": {field: 1 for field in fields}}],
+				"as": "products",
+			}},
+		]).to_list()
+
+		if not documents:
+			return []
+
+		products = {product["_id"]: product for product in documents[0]["products"]}
+
+		# $lookup does not keep the order of top
+		return await Product.views([products[item["product_id"]] for item in documents[0]["top"] if item["product_id"] in products][:limit])
+
+	@classmethod
+	async def count_orders(cls, order_ids: list[PydanticObjectId], query: dict[str, Any], counted: bool) -> tuple[int, set[PydanticObjectId]]:
+		client = cls.get_pymongo_collection().database.client
+
+		async def count_batch(session: AsyncClientSession) -> tuple[int, set[PydanticObjectId]]:
+			# the orders are reread inside the transaction, so one counted by a concurrent or crashed run is skipped
+			orders = await Order.get_pymongo_collection().find({"_id": {"$in": order_ids}, **query}, {"items.product": 1}, session=session).to_list()
+
+			pairs: collections.Counter[tuple[PydanticObjectId, PydanticObjectId]] = collections.Counter()
+
+			for order in orders:
+				pairs.update(itertools.permutations({item["product"].id for item in order.get("items", []) if isinstance(item.get("product"), DBRef)}, 2))
+
+			if pairs:
+				await CoPurchase.get_pymongo_collection().bulk_write([
+					UpdateOne({"product": product_id, "other": other_id}, {"$inc": {"orders": count if counted else -count}}, upsert=True) for (product_id, other_id), count in pairs.items()
+				], ordered=False, session=session)
+
+			if orders:
+				await Order.get_pymongo_collection().update_many({"_id": {"$in": [order["_id"] for order in orders]}}, {"$set": {"co_purchases_counted": counted}}, session=session)
+
+			return len(orders), {product_id for product_id, _ in pairs}
+
+		async with client.start_session() as session:
+			# the pair counts and the counted flags commit together, so no order is ever counted twice
+			return await session.with_transaction(count_batch)
+
+	@classmethod
+	async def count_matching(cls, query: dict[str, Any], counted: bool, batch_size: int, touched: set[PydanticObjectId]) -> int:
+		orders = 0
+		order_ids = []
+
+		# streamed by _id only, each batch is counted in its own transaction
+		async for order in Order.get_pymongo_collection().find(query, {"_id": 1}).batch_size(batch_size):
+			order_ids.append(order["_id"])
+
+			if len(order_ids) == batch_size:
+				count, products = await cls.count_orders(order_ids, query, counted)
+				orders += count
+				touched |= products
+				order_ids = []
+
+		if order_ids:
+			count, products = await cls.count_orders(order_ids, query, counted)
+			orders += count
+			touched |= products
+
+		return orders
+
+	@classmethod
+	async def update_top(cls, product_ids: list[PydanticObjectId], top_k: int) -> None:
+		await CoPurchase.get_pymongo_collection().delete_many({"product": {"$in": product_ids}, "orders": {"$lte": 0}})
+
+		# at most top_k pairs per product leave the server
+		tops = {document["_id"]: document["top"] for document in await CoPurchase.aggregate([
+			{"$match": {"product": {"$in": product_ids}}},
+			{"$group": {"_id": "$product", "top": {"$topN": {"n": top_k, "sortBy": {"orders": pymongo.DESCENDING, "other": pymongo.ASCENDING}, "output": {"product_id": "$other", "count": "$orders"}}}}},
+		]).to_list()}
+
+		now = datetime.datetime.now(tz=datetime.UTC)
+
+		# products whose last pair was cancelled away get an empty list
+		await cls.get_pymongo_collection().bulk_write([
+			UpdateOne({"_id": product_id}, {"$set": {"top": tops.get(product_id, []), "updated_at": now}}, upsert=True) for product_id in product_ids
+		], ordered=False)
+
+	@classmethod
+	async def update_from_orders(cls, top_k: int, batch_size: int, settle_time: float) -> RecommendationRun:
+		last_run = await RecommendationRun.find({"finished_at": {"$ne": None}}).sort(-RecommendationRun.until).first_or_none()
+
+		# orders are created before their checkout commits, so the newest ones are left for the next run
+		until = datetime.datetime.now(tz=datetime.UTC) - datetime.timedelta(seconds=settle_time)
+
+		run = RecommendationRun(since=last_run.until if last_run else None, until=until)
+
+		# recorded before counting, a crashed run stays unfinished and its window is scanned again
+		await run.insert()
+
+		created_at: dict[str, Any] = {"$lt": until}
+
+		if run.since is not None:
+			# overlapping the previous window is free, counted orders are skipped
+			created_at["$gte"] = run.since - datetime.timedelta(seconds=settle_time)
+
+		touched: set[PydanticObjectId] = set()
+
+		run.orders = await cls.count_matching({
+			"created_at": created_at,
+			"status": {"$ne": OrderStatus.CANCELLED.value},
+			"co_purchases_counted": {"$ne": True},
+		}, True, batch_size, touched)
+
+		# orders cancelled after they were counted take their pairs back out
+		run.cancelled_orders = await cls.count_matching({
+			"status": OrderStatus.CANCELLED.value,
+			"co_purchases_counted": True,
+		}, False, batch_size, touched)
+
+		product_ids = list(touched)
+
+		for start in range(0, len(product_ids), batch_size):
+			await cls.update_top(product_ids[start:start + batch_size], top_k)
+
+		run.products = len(product_ids)
+		run.finished_at = datetime.datetime.now(tz=datetime.UTC)
+
+		await run.save()
+
+		return run
@@ -1,12 +1,33 @@
 import datetime
 from typing import Annotated
 
+import pymongo
 from annotated_types import Interval
-from beanie import Document, Link
-from pydantic import Field
+from beanie import Document, Link, PydanticObjectId
+from beanie.operators import In
+from bson import DBRef
+from bson.errors import InvalidId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, UpdateMany, UpdateOne
+from pymongo.asynchronous.client_session import AsyncClientSession
 
-from models.product import Product
+from models.catalog_cache import CATALOG_CACHE, product_key
+from models.product import Product, RatingSummary
 from models.user import User
+from utils import decode_cursor, encode_cursor, keyset_filter
+
+
+class ReviewAuthor(BaseModel):
+	id: PydanticObjectId = Field(alias="_id")
+	username: str
+
+
+class ReviewWithAuthor(BaseModel):
+	id: PydanticObjectId
+	user: ReviewAuthor | None
+	rating: int
+	comment: str
+	created_at: datetime.datetime
 
 
 class Review(Document):
@@ -19,3 +40,93 @@ class Review(Document):
 	class Settings:
 		name = "reviews"
 		use_state_management = True
+		indexes = [
+			IndexModel([("product", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]),
+		]
+
+	@classmethod
+	async def post(cls, user: User, product: Product, rating: int, comment: str) -> "Review":
+		client = cls.get_pymongo_collection().database.client
+
+		async def insert_review(session: AsyncClientSession) -> Review:
+			review = cls(user=user, product=product, rating=rating, comment=comment)
+
+			# the review and the rating summary commit together, so the summary cannot drift from the reviews
+			await review.insert(session=session)
+			await Product.record_rating(product.id, rating, session=session)
+
+			return review
+
+		async with client.start_session() as session:
+			review = await session.with_transaction(insert_review)
+
+		await CATALOG_CACHE.invalidate(product_key(product.id))
+
+		return review
+
+	@classmethod
+	async def reconcile_ratings(cls) -> int:
+		# recomputes every rating summary from the reviews, products without reviews are reset
+		summaries: dict[PydanticObjectId, RatingSummary] = {}
+
+		for stats in await cls.aggregate([
+			{"$group": {"_id": {"product": "$product", "rating": "$rating"}, "count": {"$sum": 1}}},
+		]).to_list():
+			summary = summaries.setdefault(stats["_id"]["product"].id, RatingSummary())
+			summary.count += stats["count"]
+			summary.total += stats["_id"]["rating"] * stats["count"]
+			summary.histogram[str(stats["_id"]["rating"])] = stats["count"]
+
+		operations = []
+
+		for product_id, summary in summaries.items():
+			rating = summary.model_dump(exclude={"average"})
+
+			operations.append(UpdateOne({"_id": product_id, "rating": {"$ne": rating}}, {"$set": {"rating": rating}}))
+
+		operations.append(UpdateMany({"_id": {"$nin": list(summaries)}, "rating.count": {"$ne": 0}}, {"$set": {"rating": RatingSummary().model_dump(exclude={"average"})}}))
+
+		result = await Product.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+		await CATALOG_CACHE.clear()
+
+		return result.modified_count
+
+	@classmethod
+	async def find_page(cls, product_id: PydanticObjectId, limit: int, cursor: str | None = None) -> tuple[list[ReviewWithAuthor], str | None]:
+		query = cls.find({"product": DBRef(Product.get_collection_name(), product_id)})
+
+		if cursor is not None:
+			payload = decode_cursor(cursor)
+
+			try:
+				created_at = datetime.datetime.fromisoformat(payload["value"])
+				last_id = PydanticObjectId(payload["id"])
+			except (KeyError, TypeError, ValueError, InvalidId) as e:
+				raise ValueError("Invalid cursor") from e
+
+			query = query.find(keyset_filter("created_at", pymongo.DESCENDING, created_at, last_id))
+
+		reviews = await query.sort(("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)).limit(limit + 1).to_list()
+
+		next_cursor = None
+
+		if len(reviews) > limit:
+			reviews = reviews[:limit]
+
+			next_cursor = encode_cursor({"value": reviews[-1].created_at.isoformat(), "id": str(reviews[-1].id)})
+
+		user_ids = list({review.user.ref.id for review in reviews})
+
+		authors = {}
+
+		if user_ids:
+			authors = {author.id: author for author in await User.find(In(User.id, user_ids), projection_model=ReviewAuthor).to_list()}
+
+		return [ReviewWithAuthor(
+			id=review.id,
+			user=authors.get(review.user.ref.id),
+			rating=review.rating,
+			comment=review.comment,
+			created_at=review.created_at,
+		) for review in reviews], next_cursor
@@ -0,0 +1,111 @@
+import datetime
+from decimal import Decimal
+
+import pymongo
+from beanie import DecimalAnnotation, Document
+from bson import Decimal128
+from pydantic import Field
+from pymongo import IndexModel
+from pymongo.asynchronous.client_session import AsyncClientSession
+
+STATS_KEY = "global"
+
+
+class ShopStats(Document):
+	key: str = STATS_KEY
+	total_orders: int = 0
+	total_revenue: DecimalAnnotation = Decimal(0)
+	total_stock: int = 0
+	orders_by_status: dict[str, int] = Field(default_factory=dict)
+	updated_at: datetime.datetime | None = None
+	reconciled_at: datetime.datetime | None = None
+
+	class Settings:
+		name = "shop_stats"
+		indexes = [
+			IndexModel([("key", pymongo.ASCENDING)], unique=True),
+		]
+
+	@classmethod
+	async def get_current(cls) -> "ShopStats":
+		stats = await cls.find_one({"key": STATS_KEY})
+
+		if stats is None:
+			stats = await cls.reconcile()
+
+		return stats
+
+	@classmethod
+	async def increment(cls, increments: dict[str, int | Decimal], session: AsyncClientSession | None = None) -> None:
+		increments = {field: Decimal128(str(value)) if isinstance(value, Decimal) else value for field, value in increments.items() if value}
+
+		if not increments:
+			return
+
+		await cls.get_pymongo_collection().update_one({"key": STATS_KEY}, {
+			"$inc": increments,
+			"$currentDate": {"updated_at": True},
+		}, upsert=True, session=session)
+
+	@classmethod
+	async def record_order(cls, status: str, total_price: Decimal | None, session: AsyncClientSession | None = None) -> None:
+		await cls.increment({
+			"total_orders": 1,
+			f"orders_by_status.{status}": 1,
+			"total_revenue": cls.revenue_of(status, total_price),
+		}, session=session)
+
+	@classmethod
+	async def record_status_change(cls, previous_status: str, status: str, total_price: Decimal | None, session: AsyncClientSession | None = None) -> None:
+		await cls.increment({
+			f"orders_by_status.{previous_status}": -1,
+			f"orders_by_status.{status}": 1,
+			"total_revenue": cls.revenue_of(status, total_price) - cls.revenue_of(previous_status, total_price),
+		}, session=session)
+
+	@classmethod
+	async def record_stock(cls, delta: int, session: AsyncClientSession | None = None) -> None:
+		await cls.increment({"total_stock": delta}, session=session)
+
+	@staticmethod
+	def revenue_of(status: str, total_price: Decimal | None) -> Decimal:
+		if status == "cancelled" or total_price is None:
+			return Decimal(0)
+
+		return total_price
+
+	@classmethod
+	async def reconcile(cls) -> "ShopStats":
+		from models.order import Order, OrderStatus
+		from models.product import Product
+
+		order_stats = await Order.aggregate([
+			{"$group": {
+				"_id": "$status",
+				"total_orders": {"$sum": 1},
+				"total_revenue": {"$sum": "$total_price"},
+			}},
+		]).to_list()
+
+		product_stats = await Product.aggregate([
+			{"$group": {
+				"_id": None,
+				"total_stock": {"$sum": "$stock"},
+			}},
+		]).to_list()
+
+		orders_by_status = {stats["_id"]: stats["total_orders"] for stats in order_stats}
+		total_revenue = sum((stats["total_revenue"].to_decimal() if isinstance(stats["total_revenue"], Decimal128) else Decimal(stats["total_revenue"]) for stats in order_stats if stats["_id"] != OrderStatus.CANCELLED.value), Decimal(0))
+
+		now = datetime.datetime.now(tz=datetime.UTC)
+
+		await cls.get_pymongo_collection().update_one({"key": STATS_KEY}, {"$set": {
+			"total_orders": sum(orders_by_status.values()),
+			"total_revenue": Decimal128(str(total_revenue)),
+			"total_stock": product_stats[0]["total_stock"] if product_stats else 0,
+			"orders_by_status": orders_by_status,
+			"updated_at": now,
+			"reconciled_at": now,
+		}}, upsert=True)
+
+		return await cls.find_one({"key": STATS_KEY})
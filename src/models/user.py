@@ -1,17 +1,24 @@
 import datetime
 import logging
+from typing import Any
 
 import argon2
 import jwt
 import pymongo
-from beanie import Document, PydanticObjectId
-from pydantic import BaseModel, EmailStr, Field
+from beanie import DecimalAnnotation, Delete, Document, PydanticObjectId, Replace, Save, SaveChanges, Update, after_event
+from beanie.operators import In
+from pydantic import BaseModel, EmailStr, Field, NonNegativeInt
 from pymongo import IndexModel
 
 import config
 from models.product import Product
+from utils import AsyncPasswordHasher, TTLCache
 
 PASSWORD_HASHER = argon2.PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+ASYNC_PASSWORD_HASHER = AsyncPasswordHasher(PASSWORD_HASHER, max_concurrency=config.PASSWORD_HASH_CONCURRENCY)
+
+USER_CACHE = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+CART_CACHE = TTLCache(maxsize=config.CART_CACHE_SIZE, ttl=config.CART_CACHE_TTL)
 
 
 class UserCart(BaseModel):
@@ -20,8 +27,45 @@ class UserCart(BaseModel):
 	quantity: int
 
 
+class CartChange(BaseModel):
+	product_id: PydanticObjectId
+	size: str
+	quantity: int
+	# adds to the current quantity instead of replacing it
+	increment: bool = False
+
+	def stage(self) -> dict[str, Any]:
+		# one $set stage of an update pipeline, so the line is matched and changed inside the write itself
+		size = {"$literal": self.size}
+		matches = {"$and": [{"$eq": ["$$line.product_id", self.product_id]}, {"$eq": ["$$line.size", size]}]}
+		quantity = {"$add": ["$$line.quantity", self.quantity]} if self.increment else self.quantity
+
+		cart = {"$ifNull": ["$cart", []]}
+
+		changed = {"$filter": {
+			"input": {"$map": {"input": cart, "as": "line", "in": {"$cond": [matches, {"$mergeObjects": ["$$line", {"quantity": quantity}]}, "$$line"]}}},
+			"as": "line",
+			"cond": {"$gt": ["$$line.quantity", 0]},
+		}}
+
+		if self.quantity <= 0:
+			return {"$set": {"cart": changed}}
+
+		exists = {"$anyElementTrue": [{"$map": {"input": cart, "as": "line", "in": matches}}]}
+
+		return {"$set": {"cart": {"$cond": [exists, changed, {"$concatArrays": [changed, [{"product_id": self.product_id, "size": size, "quantity": self.quantity}]]}]}}}
+
+
+class CartProduct(BaseModel):
+	id: PydanticObjectId = Field(alias="_id")
+	name: str
+	price: DecimalAnnotation
+	stock: NonNegativeInt = 0
+	image_url: str
+
+
 class UserCartFetched(BaseModel):
-	product: Product
+	product: CartProduct
 	size: str
 	quantity: int
 
@@ -45,6 +89,26 @@ class User(Document):
 			IndexModel([("email", pymongo.ASCENDING)], unique=True),
 		]
 
+	@classmethod
+	async def get_cached(cls, user_id: PydanticObjectId | str) -> "User | None":
+		user = USER_CACHE.get(str(user_id))
+
+		if user is None:
+			user = await cls.get(user_id, fetch_links=True)
+
+			if user is None:
+				return None
+
+			USER_CACHE.set(str(user_id), user)
+
+		# handlers mutate the user before saving it, so never hand out the cached instance itself
+		return user.model_copy(deep=True)
+
+	@after_event(Save, Replace, SaveChanges, Update, Delete)
+	def invalidate_cache(self) -> None:
+		USER_CACHE.invalidate(str(self.id))
+		CART_CACHE.invalidate(str(self.id))
+
 	@staticmethod
 	def hash_password(password: str) -> str:
 		return PASSWORD_HASHER.hash(password)
@@ -63,11 +127,66 @@ class User(Document):
 			logging.error(f"Hashing error for user {self.username}: {repr(e)}")
 			return False
 
+	@staticmethod
+	async def hash_password_async(password: str) -> str:
+		return await ASYNC_PASSWORD_HASHER.hash(password)
+
+	async def verify_password_async(self, password: str) -> bool:
+		try:
+			verified = await ASYNC_PASSWORD_HASHER.verify(self.password_hash, password)
+		except argon2.exceptions.VerificationError:
+			return False
+		except argon2.exceptions.InvalidHashError as e:
+			logging.error(f"Hashing error for user {self.username}: {repr(e)}")
+			return False
+
+		# upgrade hashes made with older PASSWORD_HASHER parameters while the plain password is at hand
+		if verified and ASYNC_PASSWORD_HASHER.check_needs_rehash(self.password_hash):
+			self.password_hash = await User.hash_password_async(password)
+
+			await self.save()
+
+		return verified
+
 	def create_jwt_token(self) -> str:
 		return jwt.encode({
 			"sub": str(self.id),
 			"exp": datetime.datetime.now(tz=datetime.UTC) + config.JWT_TOKEN_EXPIRATION,
 		}, config.JWT_SECRET_KEY, "HS256")
 
+	async def change_cart(self, changes: list[CartChange]) -> bool:
+		# every change is a stage of the same update, so a batch applies atomically in one round trip
+		# and concurrent adds of a new line cannot both push it
+		update_result = await self.get_pymongo_collection().update_one({"_id": self.id}, [change.stage() for change in changes])
+
+		self.invalidate_cache()
+
+		return update_result.modified_count > 0
+
 	async def fetch_cart(self) -> list[UserCartFetched]:
-		return [UserCartFetched(product=await Product.get(cart.product_id), size=cart.size, quantity=cart.quantity) for cart in self.cart]
+		cart = CART_CACHE.get(str(self.id))
+
+		if cart is not None:
+			return cart
+
+		product_ids = list({item.product_id for item in self.cart})
+
+		products = {}
+
+		if product_ids:
+			products = {product.id: product for product in await Product.find(In(Product.id, product_ids), projection_model=CartProduct).to_list()}
+
+		cart = []
+
+		for item in self.cart:
+			product = products.get(item.product_id)
+
+			if product is None:
+				logging.warning(f"Skipping missing product {item.product_id} in cart of user {self.username}")
+				continue
+
+			cart.append(UserCartFetched(product=product, size=item.size, quantity=item.quantity))
+
+		CART_CACHE.set(str(self.id), cart)
+
+		return cart
@@ -18,4 +18,29 @@ async function deleteProduct(form) {
 	}
 
 	window.location.reload();
-}
\ No newline at end of file
+}
+
+/**
+ * @param {string} product_id
+ * @param {number} delta
+ * @returns void
+ */
+async function updateStock(product_id, delta) {
+	const response = await fetch(`/api/v1/shop/product/${product_id}/stock?delta=${delta}`, {
+		method: "PATCH",
+		headers: {
+			"Content-Type": "application/json"
+		},
+	});
+
+	const data = await response.json();
+
+	if (!response.ok) {
+		alert(JSON.stringify(data.detail));
+		return;
+	}
+
+	const stockCount = document.getElementById(`stock-count-${product_id}`);
+
+	stockCount.innerText = parseInt(stockCount.innerText) + delta;
+}
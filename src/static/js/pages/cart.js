@@ -1,27 +1,63 @@
+/** @type {Map<string, {product_id: string, size: string, quantity: number}>} */
+const pendingCartChanges = new Map();
+
+/** @type {number | undefined} */
+let cartSyncTimeout;
+
 /**
  * @param {HTMLInputElement} input
  * @param {string} product_id
  * @param {string} size
  * @returns void
  */
-async function cartItemQuantityChange(input, product_id, size) {
-	input.disabled = true;
+function cartItemQuantityChange(input, product_id, size) {
+	pendingCartChanges.set(`${product_id}:${size}`, {product_id, size, quantity: Number(input.value)});
+
+	// quick edits across several lines are sent together once the user pauses
+	clearTimeout(cartSyncTimeout);
+	cartSyncTimeout = setTimeout(syncCart, 500);
+}
 
-	const response = await fetch(`/api/v1/shop/cart/${product_id}?size=${size}&quantity=${input.value}`, {
+/**
+ * @returns {Promise<boolean>}
+ */
+async function sendCartChanges() {
+	clearTimeout(cartSyncTimeout);
+
+	const changes = [...pendingCartChanges.values()];
+	pendingCartChanges.clear();
+
+	if (changes.length === 0) {
+		return true;
+	}
+
+	const response = await fetch("/api/v1/shop/cart", {
 		method: "PATCH",
 		headers: {
 			"Content-Type": "application/json"
 		},
+		body: JSON.stringify(changes),
 	});
 
 	const data = await response.json();
 
 	if (!response.ok) {
 		alert(JSON.stringify(data.detail));
-		return;
+		return false;
 	}
 
-	input.disabled = false;
+	return true;
+}
+
+/**
+ * @returns void
+ */
+async function syncCart() {
+	for (const input of document.querySelectorAll("input[type=number]")) {
+		input.disabled = true;
+	}
+
+	await sendCartChanges();
 
 	window.location.reload();
 }
@@ -46,5 +82,38 @@ async function removeFromCart(product_id, size) {
 		return;
 	}
 
+	window.location.reload();
+}
+
+/**
+ * @param {HTMLButtonElement} button
+ * @returns void
+ */
+async function checkout(button) {
+	button.disabled = true;
+
+	// quantities still waiting for the debounced sync must be in the cart before it is ordered
+	if (!await sendCartChanges()) {
+		window.location.reload();
+		return;
+	}
+
+	const response = await fetch("/api/v1/shop/checkout", {
+		method: "POST",
+		headers: {
+			"Content-Type": "application/json"
+		},
+	});
+
+	const data = await response.json();
+
+	if (!response.ok) {
+		alert(data.detail);
+		button.disabled = false;
+		return;
+	}
+
+	alert(`Order placed, total $${data.data.total_price}`);
+
 	window.location.reload();
 }
\ No newline at end of file
@@ -46,4 +46,51 @@ async function onAddToCartSubmit(form) {
 	alert(data.message);
 
 	window.location.reload();
-}
\ No newline at end of file
+}
+
+/**
+ * @param {HTMLButtonElement} button
+ * @param {string} product_id
+ * @param {string} cursor
+ * @returns void
+ */
+async function loadMoreReviews(button, product_id, cursor) {
+	button.disabled = true;
+
+	const response = await fetch(`/api/v1/shop/product/${product_id}/reviews?cursor=${encodeURIComponent(cursor)}`);
+
+	const data = await response.json();
+
+	if (!response.ok) {
+		alert(JSON.stringify(data.detail));
+		button.disabled = false;
+		return;
+	}
+
+	const reviewList = document.getElementById("reviewList");
+
+	for (const review of data.data) {
+		const card = document.createElement("div");
+		card.className = "card border-0 shadow-sm mb-3";
+		card.innerHTML = `
+			<div class="card-body">
+				<div class="d-flex justify-content-between">
+					<h5 class="card-title fw-bold"></h5>
+					<span class="text-warning">${"★".repeat(review.rating)}${"☆".repeat(5 - review.rating)}</span>
+				</div>
+				<h6 class="card-subtitle mb-2 text-muted">${review.created_at.slice(0, 10)}</h6>
+				<p class="card-text"></p>
+			</div>`;
+		card.querySelector(".card-title").textContent = review.user ? review.user.username : "Deleted user";
+		card.querySelector(".card-text").textContent = review.comment;
+
+		reviewList.appendChild(card);
+	}
+
+	if (data.next_cursor) {
+		button.onclick = () => loadMoreReviews(button, product_id, data.next_cursor);
+		button.disabled = false;
+	} else {
+		button.remove();
+	}
+}
@@ -0,0 +1,41 @@
+__all__ = (
+	"AsyncPasswordHasher",
+	"CacheBackend",
+	"Counter",
+	"DocumentView",
+	"ExportFormat",
+	"FingerprintedStaticFiles",
+	"Gauge",
+	"Histogram",
+	"ImportReport",
+	"Lazy",
+	"MemoryCacheBackend",
+	"MongoCommandListener",
+	"MongoPoolListener",
+	"ReadThroughCache",
+	"SlowQueryLog",
+	"TTLCache",
+	"conditional_response",
+	"encode_cursor",
+	"decode_cursor",
+	"keyset_filter",
+	"read_rows",
+	"record_timing",
+	"stream_csv",
+	"stream_ndjson",
+	"timed",
+	"view_value",
+)
+
+
+from .cache import CacheBackend, MemoryCacheBackend, ReadThroughCache, TTLCache
+from .conditional import conditional_response
+from .export import ExportFormat, stream_csv, stream_ndjson
+from .static_files import FingerprintedStaticFiles
+from .hashing import AsyncPasswordHasher
+from .importer import ImportReport, read_rows
+from .lazy import Lazy
+from .metrics import Counter, Gauge, Histogram, MongoCommandListener, MongoPoolListener, record_timing, timed
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+from .slow_queries import SlowQueryLog
+from .views import DocumentView, view_value
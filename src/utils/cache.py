@@ -0,0 +1,196 @@
+import abc
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from contextlib import AbstractContextManager
+from typing import Any
+
+MISSING = object()
+
+
+class TTLCache():
+	def __init__(self, maxsize: int, ttl: float) -> None:
+		self.maxsize = maxsize
+		self.ttl = ttl
+
+		self.hits = 0
+		self.misses = 0
+
+		self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		entry = self._entries.get(key)
+
+		if entry is None:
+			self.misses += 1
+			return default
+
+		expires_at, value = entry
+
+		if expires_at <= time.monotonic():
+			del self._entries[key]
+			self.misses += 1
+			return default
+
+		self._entries.move_to_end(key)
+		self.hits += 1
+
+		return value
+
+	def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+		if self.maxsize <= 0:
+			return
+
+		self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+		self._entries.move_to_end(key)
+
+		while len(self._entries) > self.maxsize:
+			self._entries.popitem(last=False)
+
+	def invalidate(self, key: Hashable) -> None:
+		self._entries.pop(key, None)
+
+	def clear(self) -> None:
+		self._entries.clear()
+
+	def stats(self) -> dict[str, int | float]:
+		requests = self.hits + self.misses
+
+		return {
+			"size": len(self._entries),
+			"maxsize": self.maxsize,
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_ratio": self.hits / requests if requests else 0.0,
+		}
+
+
+class CacheBackend(abc.ABC):
+	@abc.abstractmethod
+	async def get(self, key: str) -> Any:
+		"""Return the cached value or `MISSING`."""
+
+	@abc.abstractmethod
+	async def set(self, key: str, value: Any, ttl: float) -> None:
+		...
+
+	@abc.abstractmethod
+	async def delete(self, *keys: str) -> None:
+		...
+
+	@abc.abstractmethod
+	async def clear(self) -> None:
+		...
+
+
+class MemoryCacheBackend(CacheBackend):
+	def __init__(self, maxsize: int) -> None:
+		self._cache = TTLCache(maxsize=maxsize, ttl=0)
+
+	async def get(self, key: str) -> Any:
+		return self._cache.get(key, MISSING)
+
+	async def set(self, key: str, value: Any, ttl: float) -> None:
+		self._cache.set(key, value, ttl=ttl)
+
+	async def delete(self, *keys: str) -> None:
+		for key in keys:
+			self._cache.invalidate(key)
+
+	async def clear(self) -> None:
+		self._cache.clear()
+
+
+class ReadThroughCache():
+	def __init__(self, backend: CacheBackend, ttl: float, load_context: Callable[[], AbstractContextManager[Any]] = contextlib.nullcontext) -> None:
+		self.backend = backend
+		self.ttl = ttl
+		# entered around every load, e.g. to pin the reads that fill the cache
+		self.load_context = load_context
+
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.loads = 0
+		self.load_seconds = 0.0
+		self.max_load_seconds = 0.0
+
+		self._loading: dict[str, asyncio.Future[Any]] = {}
+		self._generation = 0
+
+		self.changed_at = time.time()
+
+	@property
+	def version(self) -> int:
+		return self._generation
+
+	async def get_or_load[T](self, key: str, loader: Callable[[], Awaitable[T]], ttl: float | None = None) -> T:
+		value = await self.backend.get(key)
+
+		if value is not MISSING:
+			self.hits += 1
+			return value
+
+		self.misses += 1
+
+		future = self._loading.get(key)
+
+		if future is None:
+			future = asyncio.ensure_future(self._load(key, loader, self.ttl if ttl is None else ttl))
+			future.add_done_callback(lambda _: self._loading.pop(key, None))
+
+			self._loading[key] = future
+		else:
+			self.coalesced += 1
+
+		return await asyncio.shield(future)
+
+	async def _load[T](self, key: str, loader: Callable[[], Awaitable[T]], ttl: float) -> T:
+		generation = self._generation
+
+		started = time.perf_counter()
+
+		with self.load_context():
+			value = await loader()
+
+		elapsed = time.perf_counter() - started
+
+		self.loads += 1
+		self.load_seconds += elapsed
+		self.max_load_seconds = max(self.max_load_seconds, elapsed)
+
+		# an invalidation that raced with this load means the value may already be stale
+		if value is not None and generation == self._generation:
+			await self.backend.set(key, value, ttl)
+
+		return value
+
+	async def invalidate(self, *keys: str) -> None:
+		self._generation += 1
+		self.changed_at = time.time()
+
+		await self.backend.delete(*keys)
+
+	async def clear(self) -> None:
+		self._generation += 1
+		self.changed_at = time.time()
+
+		await self.backend.clear()
+
+	def stats(self) -> dict[str, int | float]:
+		requests = self.hits + self.misses
+
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"coalesced": self.coalesced,
+			"hit_ratio": self.hits / requests if requests else 0.0,
+			"loads": self.loads,
+			"avg_load_ms": self.load_seconds / self.loads * 1000 if self.loads else 0.0,
+			"max_load_ms": self.max_load_seconds * 1000,
+		}
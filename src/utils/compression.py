@@ -0,0 +1,55 @@
+import zlib
+
+try:
+	from compression import zstd
+except ImportError:
+	zstd = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+SUPPORTED_ENCODINGS: tuple[str, ...] = (ZSTD, GZIP) if zstd is not None else (GZIP,)
+
+
+class Compressor():
+	def __init__(self, encoding: str, level: int) -> None:
+		self.encoding = encoding
+
+		if encoding == ZSTD:
+			self._zstd = zstd.ZstdCompressor(level=level)
+		else:
+			self._gzip = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+	def compress(self, data: bytes, final: bool) -> bytes:
+		# intermediate chunks are flushed so streamed responses reach the client as they are produced
+		if self.encoding == ZSTD:
+			return self._zstd.compress(data, mode=zstd.ZstdCompressor.FLUSH_FRAME if final else zstd.ZstdCompressor.FLUSH_BLOCK)
+
+		return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+	return Compressor(encoding, level).compress(data, final=True)
+
+def accepted_encodings(accept_encoding: str) -> list[str]:
+	# supported encodings the client accepts, in server preference order
+	accepted = {}
+
+	for part in accept_encoding.split(","):
+		coding, _, params = part.strip().partition(";")
+		quality = 1.0
+
+		for param in params.split(";"):
+			name, _, value = param.strip().partition("=")
+
+			if name == "q":
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.0
+
+		accepted[coding.strip().lower()] = quality
+
+	wildcard = accepted.get("*", 0.0)
+
+	return [encoding for encoding in SUPPORTED_ENCODINGS if accepted.get(encoding, wildcard) > 0]
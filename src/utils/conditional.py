@@ -0,0 +1,53 @@
+import email.utils
+import hashlib
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def body_etag(body: bytes) -> str:
+	return f"W/\"{hashlib.blake2b(body, digest_size=16).hexdigest()}\""
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+	if if_none_match.strip() == "*":
+		return True
+
+	# weak comparison, as recommended for If-None-Match
+	return etag.removeprefix("W/") in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+
+def not_modified_since(if_modified_since: str, last_modified: float) -> bool:
+	try:
+		since = email.utils.parsedate_to_datetime(if_modified_since)
+	except (TypeError, ValueError):
+		return False
+
+	return int(last_modified) <= since.timestamp()
+
+def conditional_response(request: Request, response: Response, last_modified: float | None = None, shared: bool = False) -> Response:
+	if request.method not in ("GET", "HEAD") or response.status_code != 200:
+		return response
+
+	headers = {
+		"ETag": body_etag(response.body),
+		# pages may differ per user, so caches have to revalidate and only share anonymous pages
+		"Cache-Control": "public, no-cache" if shared else "private, no-cache",
+		"Vary": "Cookie",
+	}
+
+	if last_modified is not None:
+		headers["Last-Modified"] = email.utils.formatdate(last_modified, usegmt=True)
+
+	if_none_match = request.headers.get("if-none-match")
+	if_modified_since = request.headers.get("if-modified-since")
+
+	if if_none_match is not None:
+		not_modified = etag_matches(if_none_match, headers["ETag"])
+	else:
+		not_modified = last_modified is not None and if_modified_since is not None and not_modified_since(if_modified_since, last_modified)
+
+	if not_modified:
+		return Response(status_code=304, headers=headers)
+
+	response.headers.update(headers)
+
+	return response
@@ -0,0 +1,82 @@
+import csv
+import enum
+import io
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from typing import Any
+
+import orjson
+from bson import DBRef, Decimal128, ObjectId
+
+
+class ExportFormat(enum.Enum):
+	NDJSON = "ndjson"
+	CSV = "csv"
+
+	@property
+	def media_type(self) -> str:
+		if self is ExportFormat.CSV:
+			return "text/csv"
+
+		return "application/x-ndjson"
+
+
+def bson_default(value: Any) -> Any:
+	if isinstance(value, ObjectId):
+		return str(value)
+
+	if isinstance(value, Decimal128):
+		return str(value.to_decimal())
+
+	if isinstance(value, DBRef):
+		return str(value.id)
+
+	raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+async def stream_ndjson(documents: AsyncIterable[dict[str, Any]], batch_size: int) -> AsyncIterator[bytes]:
+	batch = []
+
+	async for document in documents:
+		batch.append(orjson.dumps(document, default=bson_default, option=orjson.OPT_APPEND_NEWLINE))
+
+		if len(batch) >= batch_size:
+			yield b"".join(batch)
+			batch.clear()
+
+	if batch:
+		yield b"".join(batch)
+
+def csv_value(value: Any) -> Any:
+	if value is None:
+		return ""
+
+	if isinstance(value, (dict, list)):
+		return orjson.dumps(value, default=bson_default).decode()
+
+	if isinstance(value, (ObjectId, Decimal128, DBRef)):
+		return bson_default(value)
+
+	if hasattr(value, "isoformat"):
+		return value.isoformat()
+
+	return value
+
+async def stream_csv(documents: AsyncIterable[dict[str, Any]], columns: Sequence[str], batch_size: int) -> AsyncIterator[bytes]:
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+
+	writer.writerow(columns)
+
+	rows = 0
+
+	async for document in documents:
+		writer.writerow([csv_value(document.get(column)) for column in columns])
+		rows += 1
+
+		if rows >= batch_size:
+			yield buffer.getvalue().encode()
+
+			buffer.seek(0)
+			buffer.truncate()
+			rows = 0
+
+	yield buffer.getvalue().encode()
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import argon2
+
+
+class AsyncPasswordHasher():
+	def __init__(self, hasher: argon2.PasswordHasher, max_concurrency: int) -> None:
+		self.hasher = hasher
+		self.max_concurrency = max_concurrency
+
+		self.waiting = 0
+		self.running = 0
+		self.completed = 0
+		self.max_waiting = 0
+		self.wait_seconds = 0.0
+
+		# argon2 releases the GIL while hashing, so plain threads run it in parallel
+		self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="argon2")
+		self._semaphore = asyncio.Semaphore(max_concurrency)
+
+	async def _run[T](self, func: Callable[..., T], *args: Any) -> T:
+		self.waiting += 1
+		self.max_waiting = max(self.max_waiting, self.waiting)
+
+		started = time.perf_counter()
+
+		try:
+			await self._semaphore.acquire()
+		finally:
+			self.waiting -= 1
+
+		self.wait_seconds += time.perf_counter() - started
+		self.running += 1
+
+		try:
+			return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+		finally:
+			self.running -= 1
+			self.completed += 1
+			self._semaphore.release()
+
+	async def hash(self, password: str) -> str:
+		return await self._run(self.hasher.hash, password)
+
+	async def verify(self, password_hash: str, password: str) -> bool:
+		return await self._run(self.hasher.verify, password_hash, password)
+
+	def check_needs_rehash(self, password_hash: str) -> bool:
+		return self.hasher.check_needs_rehash(password_hash)
+
+	def stats(self) -> dict[str, int | float]:
+		return {
+			"max_concurrency": self.max_concurrency,
+			"running": self.running,
+			"waiting": self.waiting,
+			"max_waiting": self.max_waiting,
+			"completed": self.completed,
+			"avg_wait_ms": self.wait_seconds / self.completed * 1000 if self.completed else 0.0,
+		}
@@ -0,0 +1,71 @@
+import csv
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import orjson
+
+from .export import ExportFormat
+
+
+class ImportReport():
+	def __init__(self, max_errors: int = 1_000) -> None:
+		self.max_errors = max_errors
+		self.rows = 0
+		self.upserted = 0
+		self.modified = 0
+		self.matched = 0
+		self.failed = 0
+		self.errors: list[dict[str, Any]] = []
+		self.started = time.perf_counter()
+		self.elapsed = 0.0
+
+	def add_error(self, row: int, message: str) -> None:
+		self.failed += 1
+
+		if len(self.errors) < self.max_errors:
+			self.errors.append({"row": row, "error": message})
+
+	def finish(self) -> "ImportReport":
+		self.elapsed = time.perf_counter() - self.started
+
+		return self
+
+	def as_dict(self) -> dict[str, Any]:
+		return {
+			"rows": self.rows,
+			"upserted": self.upserted,
+			"modified": self.modified,
+			"matched": self.matched,
+			"failed": self.failed,
+			"elapsed_s": round(self.elapsed, 3),
+			"rows_per_second": round(self.rows / self.elapsed, 1) if self.elapsed else 0.0,
+			"errors": self.errors,
+		}
+
+
+def read_rows(lines: Iterable[str], import_format: ExportFormat) -> Iterator[tuple[int, dict[str, Any] | str]]:
+	# yields (row number, row) and (row number, error message) for rows that could not be parsed
+	if import_format is ExportFormat.CSV:
+		reader = csv.DictReader(lines)
+
+		for row in reader:
+			yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+
+		return
+
+	for line_number, line in enumerate(lines, start=1):
+		if not line.strip():
+			continue
+
+		try:
+			row = orjson.loads(line)
+		except orjson.JSONDecodeError as e:
+			yield line_number, f"Invalid JSON: {e}"
+			continue
+
+		if not isinstance(row, dict):
+			yield line_number, "Expected a JSON object"
+			continue
+
+		yield line_number, row
@@ -0,0 +1,29 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Generator
+from typing import Any
+
+
+class Lazy[T]():
+	def __init__(self, loader: Callable[[], Awaitable[T]]) -> None:
+		self._loader = loader
+		self._task: asyncio.Future[T] | None = None
+
+	@classmethod
+	def ready(cls, value: T) -> "Lazy[T]":
+		async def loader() -> T:
+			return value
+
+		return cls(loader)
+
+	@property
+	def resolved(self) -> bool:
+		return self._task is not None and self._task.done()
+
+	async def get(self) -> T:
+		if self._task is None:
+			self._task = asyncio.ensure_future(self._loader())
+
+		return await asyncio.shield(self._task)
+
+	def __await__(self) -> Generator[Any, None, T]:
+		return self.get().__await__()
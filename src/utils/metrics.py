@@ -0,0 +1,234 @@
+import abc
+import bisect
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections.abc import Iterator, Sequence
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# per request durations in seconds, filled by whoever does the work and read back into Server-Timing
+REQUEST_TIMINGS: contextvars.ContextVar[dict[str, float] | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+def escape_label(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	labels = [f"{name}=\"{escape_label(value)}\"" for name, value in zip(names, values)]
+
+	if extra:
+		labels.append(extra)
+
+	return "{" + ",".join(labels) + "}" if labels else ""
+
+def format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(abc.ABC):
+	TYPE = ""
+
+	def __init__(self, name: str, description: str, labels: Sequence[str] = ()) -> None:
+		self.name = name
+		self.description = description
+		self.labels = tuple(labels)
+
+		self._lock = threading.Lock()
+
+	@abc.abstractmethod
+	def samples(self) -> Iterator[str]:
+		...
+
+	def render(self) -> str:
+		return "\n".join((f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.TYPE}", *self.samples()))
+
+
+class Counter(Metric):
+	TYPE = "counter"
+
+	def __init__(self, name: str, description: str, labels: Sequence[str] = ()) -> None:
+		super().__init__(name, description, labels)
+
+		self._values: dict[tuple[str, ...], float] = {}
+
+	def inc(self, *label_values: str, amount: float = 1) -> None:
+		with self._lock:
+			self._values[label_values] = self._values.get(label_values, 0) + amount
+
+	def samples(self) -> Iterator[str]:
+		for label_values, value in sorted(self._values.items()):
+			yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Gauge(Counter):
+	TYPE = "gauge"
+
+	def dec(self, *label_values: str, amount: float = 1) -> None:
+		self.inc(*label_values, amount=-amount)
+
+	def set(self, value: float, *label_values: str) -> None:
+		with self._lock:
+			self._values[label_values] = value
+
+
+class Histogram(Metric):
+	TYPE = "histogram"
+
+	def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+		super().__init__(name, description, labels)
+
+		self.buckets = tuple(sorted(buckets))
+
+		self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+	def observe(self, value: float, *label_values: str) -> None:
+		with self._lock:
+			counts, totals = self._values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+
+			counts[bisect.bisect_left(self.buckets, value)] += 1
+			totals[0] += value
+
+	def samples(self) -> Iterator[str]:
+		for label_values, (counts, totals) in sorted(self._values.items()):
+			cumulative = 0
+
+			for bound, count in zip((*self.buckets, math.inf), counts):
+				cumulative += count
+				le = f"le=\"{format_value(bound)}\""
+
+				yield f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}"
+
+			yield f"{self.name}_sum{format_labels(self.labels, label_values)} {format_value(totals[0])}"
+			yield f"{self.name}_count{format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Registry():
+	def __init__(self) -> None:
+		self._metrics: dict[str, Metric] = {}
+
+	def register[M: Metric](self, metric: M) -> M:
+		self._metrics[metric.name] = metric
+
+		return metric
+
+	def render(self) -> str:
+		return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def record_timing(name: str, seconds: float) -> None:
+	timings = REQUEST_TIMINGS.get()
+
+	if timings is not None:
+		timings[name] = timings.get(name, 0.0) + seconds
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+	started = time.perf_counter()
+
+	try:
+		yield
+	finally:
+		record_timing(name, time.perf_counter() - started)
+
+def server_timing(timings: dict[str, float]) -> str:
+	return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+class MongoCommandListener(monitoring.CommandListener):
+	def __init__(self, histogram: Histogram, failures: Counter) -> None:
+		self.histogram = histogram
+		self.failures = failures
+
+		self._collections: dict[tuple[object, int], str] = {}
+
+	def started(self, event: monitoring.CommandStartedEvent) -> None:
+		collection = event.command.get(event.command_name)
+
+		if event.command_name == "getMore":
+			collection = event.command.get("collection")
+
+		self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+	def finish(self, event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent) -> str:
+		collection = self._collections.pop((event.connection_id, event.request_id), "")
+		seconds = event.duration_micros / 1_000_000
+
+		self.histogram.observe(seconds, event.database_name, collection, event.command_name)
+
+		# listeners run in the task that issued the command, so this lands on the right request
+		record_timing("db", seconds)
+
+		return collection
+
+	def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+		self.finish(event)
+
+	def failed(self, event: monitoring.CommandFailedEvent) -> None:
+		collection = self.finish(event)
+
+		self.failures.inc(event.database_name, collection, event.command_name)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+	def __init__(self, connections: Gauge, checkout_wait: Histogram, checkout_failures: Counter) -> None:
+		self.connections = connections
+		self.checkout_wait = checkout_wait
+		self.checkout_failures = checkout_failures
+
+	@staticmethod
+	def server(address: tuple[str, int | None]) -> str:
+		host, port = address
+
+		return f"{host}:{port}" if port is not None else host
+
+	def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+		pass
+
+	def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+		pass
+
+	def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+		pass
+
+	def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+		pass
+
+	def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+		self.connections.inc(self.server(event.address), "open")
+
+	def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+		pass
+
+	def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+		self.connections.dec(self.server(event.address), "open")
+
+	def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+		self.connections.inc(self.server(event.address), "waiting")
+
+	def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+		server = self.server(event.address)
+
+		self.connections.dec(server, "waiting")
+		self.checkout_wait.observe(event.duration, server)
+		self.checkout_failures.inc(server, str(event.reason))
+
+	def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+		server = self.server(event.address)
+
+		self.connections.dec(server, "waiting")
+		self.connections.inc(server, "in_use")
+		self.checkout_wait.observe(event.duration, server)
+
+	def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+		self.connections.dec(self.server(event.address), "in_use")
@@ -0,0 +1,28 @@
+import base64
+from typing import Any
+
+import orjson
+import pymongo
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+	return base64.urlsafe_b64encode(orjson.dumps(payload)).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+	try:
+		payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+	except ValueError as e:
+		raise ValueError("Invalid cursor") from e
+
+	if not isinstance(payload, dict):
+		raise ValueError("Invalid cursor")
+
+	return payload
+
+def keyset_filter(field: str, direction: int, value: Any, last_id: Any) -> dict[str, Any]:
+	operator = "$gt" if direction == pymongo.ASCENDING else "$lt"
+
+	return {"$or": [
+		{field: {operator: value}},
+		{field: value, "_id": {operator: last_id}},
+	]}
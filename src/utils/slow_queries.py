@@ -0,0 +1,172 @@
+import asyncio
+import collections
+import contextvars
+import datetime
+import logging
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+import orjson
+from pymongo import AsyncMongoClient, monitoring
+
+from .cache import TTLCache
+from .export import bson_default
+
+EXPLAINABLE_COMMANDS = frozenset(("find", "aggregate", "count", "distinct"))
+
+# session, transaction and routing fields are rejected inside an explain
+UNEXPLAINABLE_FIELDS = frozenset(("lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "signature"))
+
+FLAGGED_STAGES = frozenset(("COLLSCAN", "SORT"))
+
+
+def json_default(value: Any) -> Any:
+	try:
+		return bson_default(value)
+	except TypeError:
+		return str(value)
+
+def jsonable(value: Any) -> Any:
+	return orjson.loads(orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS))
+
+def query_shape(value: Any) -> Any:
+	# drop the literal values so the same query with other parameters is only explained once
+	if isinstance(value, Mapping):
+		return {key: query_shape(item) for key, item in value.items()}
+
+	if isinstance(value, list):
+		return [query_shape(item) for item in value]
+
+	return 1
+
+def command_filter_and_sort(command_name: str, command: Mapping[str, Any]) -> tuple[Any, Any]:
+	if command_name == "aggregate":
+		pipeline = command.get("pipeline") or []
+		match = next((stage["$match"] for stage in pipeline if "$match" in stage), None)
+		sort = next((stage["$sort"] for stage in pipeline if "$sort" in stage), None)
+
+		return match, sort
+
+	return command.get("filter", command.get("query")), command.get("sort")
+
+def plan_stages(plan: Any) -> Iterator[str]:
+	if isinstance(plan, Mapping):
+		if isinstance(plan.get("stage"), str):
+			yield plan["stage"]
+
+		for value in plan.values():
+			yield from plan_stages(value)
+	elif isinstance(plan, list):
+		for item in plan:
+			yield from plan_stages(item)
+
+def winning_plan(explain: Mapping[str, Any]) -> Any:
+	# aggregations nest the plan of their initial query under the $cursor stage
+	planner = explain.get("queryPlanner")
+
+	if planner is None:
+		for stage in explain.get("stages", []):
+			if "$cursor" in stage:
+				planner = stage["$cursor"].get("queryPlanner")
+				break
+
+	if planner is None:
+		return None
+
+	plan = planner.get("winningPlan", {})
+
+	return plan.get("queryPlan", plan)
+
+
+class SlowQueryLog(monitoring.CommandListener):
+	def __init__(self, threshold: float, size: int, explain_interval: float) -> None:
+		self.threshold = threshold
+		self.entries: collections.deque[dict[str, Any]] = collections.deque(maxlen=size)
+		self.client: AsyncMongoClient | None = None
+
+		self._commands: dict[tuple[object, int], tuple[str, Mapping[str, Any]]] = {}
+		self._explained = TTLCache(maxsize=1_000, ttl=explain_interval)
+		self._tasks: set[asyncio.Task] = set()
+
+	def started(self, event: monitoring.CommandStartedEvent) -> None:
+		if self.threshold < 0:
+			return
+
+		self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+	def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+		self.finish(event)
+
+	def failed(self, event: monitoring.CommandFailedEvent) -> None:
+		self.finish(event)
+
+	def finish(self, event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent) -> None:
+		started = self._commands.pop((event.connection_id, event.request_id), None)
+
+		if started is None or event.duration_micros < self.threshold * 1_000_000:
+			return
+
+		database, command = started
+		collection = command.get(event.command_name)
+		query_filter, sort = command_filter_and_sort(event.command_name, command)
+
+		entry = {
+			"at": datetime.datetime.now(tz=datetime.UTC),
+			"duration_ms": event.duration_micros / 1000,
+			"database": database,
+			"collection": collection if isinstance(collection, str) else command.get("collection", ""),
+			"command": event.command_name,
+			"filter": jsonable(query_filter),
+			"sort": jsonable(sort),
+			"failed": isinstance(event, monitoring.CommandFailedEvent),
+			"plan": None,
+			"flags": [],
+		}
+
+		self.entries.append(entry)
+
+		shape = orjson.dumps((database, event.command_name, entry["collection"], query_shape(command.get("pipeline", query_filter)), query_shape(sort)), default=json_default)
+
+		explained = self._explained.get(shape)
+
+		if explained is not None:
+			# the plan of a known shape is reused until it expires
+			entry["plan"] = explained["plan"]
+			entry["flags"] = explained["flags"]
+
+		if self.client is None or event.command_name not in EXPLAINABLE_COMMANDS or explained is not None:
+			logging.warning(f"Slow query on {database}.{entry['collection']} ({event.command_name}) took {entry['duration_ms']:.1f}ms, filter {entry['filter']}, sort {entry['sort']}, flags {entry['flags'] or 'none'}")
+			return
+
+		self._explained.set(shape, entry)
+
+		# listeners run inside the command, so the explain goes to its own task with a fresh context
+		# to keep its round trip out of the request's Server-Timing
+		task = asyncio.get_running_loop().create_task(self.explain(entry, command), context=contextvars.Context())
+
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def explain(self, entry: dict[str, Any], command: Mapping[str, Any]) -> None:
+		try:
+			explain = await self.client[entry["database"]].command({
+				"explain": {key: value for key, value in command.items() if key not in UNEXPLAINABLE_FIELDS},
+				"verbosity": "queryPlanner",
+			})
+		except Exception as e:
+			logging.error(f"Explain of slow query on {entry['database']}.{entry['collection']} failed: {repr(e)}")
+			return
+
+		plan = winning_plan(explain)
+
+		entry["plan"] = jsonable(plan)
+		entry["flags"] = sorted(FLAGGED_STAGES.intersection(plan_stages(plan)))
+
+		log = logging.error if entry["flags"] else logging.warning
+		log(f"Slow query on {entry['database']}.{entry['collection']} ({entry['command']}) took {entry['duration_ms']:.1f}ms, filter {entry['filter']}, sort {entry['sort']}, flags {entry['flags'] or 'none'}, plan {orjson.dumps(entry['plan']).decode()}")
+
+	def recent(self, flagged_only: bool = False) -> list[dict[str, Any]]:
+		return [entry for entry in reversed(self.entries) if entry["flags"] or not flagged_only]
+
+	def clear(self) -> None:
+		self.entries.clear()
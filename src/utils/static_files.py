@@ -0,0 +1,102 @@
+import functools
+import hashlib
+import mimetypes
+import os
+import stat
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .compression import GZIP, ZSTD, accepted_encodings
+
+PRECOMPRESSED_SUFFIXES = {GZIP: ".gz", ZSTD: ".zst"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def fingerprint(path: str, content: bytes) -> str:
+	root, extension = os.path.splitext(path)
+
+	return f"{root}.{hashlib.blake2b(content, digest_size=8).hexdigest()}{extension}"
+
+
+class FingerprintedStaticFiles(StaticFiles):
+	@functools.cached_property
+	def manifest(self) -> dict[str, str]:
+		# logical path -> content hashed path, the hash changes whenever the file does
+		# hashed on first use instead of at import so starting a worker does not read every static file
+		manifest = {}
+
+		for root, _, filenames in os.walk(self.directory):
+			for filename in filenames:
+				if filename.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+					continue
+
+				full_path = os.path.join(root, filename)
+				path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+
+				with open(full_path, "rb") as file:
+					manifest[path] = fingerprint(path, file.read())
+
+		return manifest
+
+	@functools.cached_property
+	def originals(self) -> dict[str, str]:
+		return {hashed: path for path, hashed in self.manifest.items()}
+
+	def url_path(self, path: str) -> str:
+		return self.manifest.get(path, path)
+
+	async def get_response(self, path: str, scope: Scope) -> Response:
+		path = path.replace(os.sep, "/")
+		original = self.originals.get(path)
+
+		response = await self.precompressed_response(original or path, scope)
+
+		if response is None:
+			response = await super().get_response(original or path, scope)
+
+		# hashed urls never change content, plain ones must be revalidated
+		response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if original is not None else "no-cache"
+
+		return response
+
+	async def precompressed_response(self, path: str, scope: Scope) -> Response | None:
+		if scope["method"] not in ("GET", "HEAD"):
+			return None
+
+		request_headers = Headers(scope=scope)
+
+		for encoding in accepted_encodings(request_headers.get("accept-encoding", "")):
+			full_path, stat_result, original_stat_result = await anyio.to_thread.run_sync(self.lookup_variant, path, PRECOMPRESSED_SUFFIXES[encoding])
+
+			# a variant older than its source was left behind by a previous build
+			if stat_result is None or original_stat_result is None or stat_result.st_mtime < original_stat_result.st_mtime:
+				continue
+
+			response = FileResponse(full_path, stat_result=stat_result, media_type=mimetypes.guess_type(path)[0] or "text/plain", headers={
+				"Content-Encoding": encoding,
+				"Vary": "Accept-Encoding",
+			})
+
+			if self.is_not_modified(response.headers, request_headers):
+				return NotModifiedResponse(response.headers)
+
+			return response
+
+		return None
+
+	def lookup_variant(self, path: str, suffix: str) -> tuple[str, os.stat_result | None, os.stat_result | None]:
+		try:
+			_, original_stat_result = self.lookup_path(path)
+			full_path, stat_result = self.lookup_path(path + suffix)
+		except (OSError, ValueError):
+			return "", None, None
+
+		if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+			return "", None, None
+
+		return full_path, stat_result, original_stat_result
@@ -0,0 +1,36 @@
+import datetime
+from typing import Any
+
+from bson import Decimal128, ObjectId
+
+
+class DocumentView(dict):
+	# read only rows built straight from raw documents, orjson serializes them natively and
+	# templates and cursors still get attribute access
+	__slots__ = ()
+
+	def __getattr__(self, name: str) -> Any:
+		try:
+			return self[name]
+		except KeyError:
+			if name == "id" and "_id" in self:
+				return self["_id"]
+
+			raise AttributeError(name) from None
+
+
+def view_value(value: Any) -> Any:
+	# matches how the documents serialize, decimals as strings, ids as hex and utc times with a Z
+	if isinstance(value, Decimal128):
+		return str(value.to_decimal())
+
+	if isinstance(value, ObjectId):
+		return str(value)
+
+	if isinstance(value, datetime.datetime):
+		return value.isoformat().replace("+00:00", "Z")
+
+	if isinstance(value, list):
+		return [view_value(item) for item in value]
+
+	return value